@@ -2,36 +2,84 @@ from decimal import Decimal
 
 from django.conf import settings
 from shop.models import Product
-from coupons.models import Coupon
+from coupons.cache import get_coupon
+
+EMPTY_SUMMARY = {"count": 0, "total": "0.00"}
+
+
+def get_cart_summary(session):
+    """
+    Return the item count and subtotal kept in the session, as
+    ``{"count": int, "total": str}``, without loading the cart lines.
+    """
+    summary = session.get(settings.CART_SUMMARY_SESSION_ID)
+    if summary is None:
+        if not session.get(settings.CART_SESSION_ID):
+            return EMPTY_SUMMARY
+        # Session created before summaries were stored
+        summary = Cart.summarize(session[settings.CART_SESSION_ID])
+        session[settings.CART_SUMMARY_SESSION_ID] = summary
+    return summary
+
+
+class CartLine:
+    __slots__ = ("product", "quantity", "price", "total_price", "update_quantity_form")
+
+    def __init__(self, product, quantity, price):
+        self.product = product
+        self.quantity = quantity
+        self.price = price
+        self.total_price = price * quantity
+        self.update_quantity_form = None
 
 
 class Cart:
     def __init__(self, request):
+        self.request = request
         self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
+        # An empty cart is only stored once something is added to it
+        self.cart = self.session.get(settings.CART_SESSION_ID) or {}
         self.coupon_id = self.session.get("coupon_id")
+        self._lines = None
 
     def __iter__(self):
-        product_ids = list(self.cart.keys())
-        products = Product.objects.filter(id__in=[int(pid) for pid in product_ids])
+        return iter(self.lines)
 
-        cart = self.cart.copy()
-        product_map = {str(p.id): p for p in products}
-
-        # keep session order (better UX)
-        for pid in product_ids:
-            cart[pid]["product"] = product_map[pid]
-
-        for item in cart.values():
-            item["price"] = Decimal(item["price"])
-            item["total_price"] = item["price"] * item["quantity"]
-            yield item
+    @property
+    def lines(self):
+        """
+        The cart contents as :class:`CartLine` objects, built with a single
+        product query the first time they are needed.
+        """
+        if self._lines is None:
+            products = Product.objects.with_translations().in_bulk(
+                [int(pid) for pid in self.cart]
+            )
+            # keep session order (better UX); skip products deleted meanwhile
+            self._lines = [
+                CartLine(products[int(pid)], item["quantity"], Decimal(item["price"]))
+                for pid, item in self.cart.items()
+                if int(pid) in products
+            ]
+        return self._lines
 
     def __len__(self):
-        return sum(item["quantity"] for item in self.cart.values())
+        return self.summary["count"]
+
+    @property
+    def summary(self):
+        return get_cart_summary(self.session)
+
+    @staticmethod
+    def summarize(cart):
+        total = sum(
+            (Decimal(item["price"]) * item["quantity"] for item in cart.values()),
+            Decimal("0.00"),
+        )
+        return {
+            "count": sum(item["quantity"] for item in cart.values()),
+            "total": str(total.quantize(Decimal("0.01"))),
+        }
 
     def add(self, product, quantity=1, override_quantity=False):
         product_id = str(product.id)
@@ -45,7 +93,32 @@ class Cart:
 
         self.save()
 
+    def update_prices(self, products):
+        """
+        Replace the stored unit price of the given products with their
+        current price.
+        """
+        for product in products:
+            product_id = str(product.id)
+            if product_id in self.cart:
+                self.cart[product_id]["price"] = str(product.price)
+        self.save()
+
+    def remove_missing(self):
+        """
+        Drop the products that were deleted after being added to the cart.
+        """
+        present = {str(line.product.id) for line in self.lines}
+        missing = [product_id for product_id in self.cart if product_id not in present]
+        for product_id in missing:
+            del self.cart[product_id]
+        if missing:
+            self.save()
+
     def save(self):
+        self._lines = None
+        self.session[settings.CART_SESSION_ID] = self.cart
+        self.session[settings.CART_SUMMARY_SESSION_ID] = self.summarize(self.cart)
         self.session.modified = True
 
     def remove(self, product):
@@ -55,25 +128,32 @@ class Cart:
             self.save()
 
     def clear(self):
+        self.cart = {}
+        self._lines = None
         self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.pop(settings.CART_SUMMARY_SESSION_ID, None)
         self.session.pop("coupon_id", None)
-        self.save()
+        self.session.modified = True
 
     def get_total_price(self) -> Decimal:
-        return sum(
-            Decimal(item["price"]) * item["quantity"] for item in self.cart.values()
-        )
+        if self._lines is not None:
+            return sum((line.total_price for line in self._lines), Decimal("0.00"))
+        return Decimal(self.summary["total"])
 
     @property
     def coupon(self):
         if not self.coupon_id:
             return None
-        try:
-            return Coupon.objects.get(id=self.coupon_id)
-        except Coupon.DoesNotExist:
+        # Resolved at most once per request, shared by every Cart built for it
+        resolved = getattr(self.request, "_cart_coupon", None)
+        if resolved is not None and resolved[0] == self.coupon_id:
+            return resolved[1]
+        coupon = get_coupon(self.coupon_id)
+        if coupon is None:
             self.session.pop("coupon_id", None)
-            self.save()
-            return None
+            self.session.modified = True
+        self.request._cart_coupon = (self.coupon_id, coupon)
+        return coupon
 
     def get_discount(self) -> Decimal:
         coupon = self.coupon
@@ -1,5 +1,10 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+
+from .cart import Cart, get_cart_summary
 
 
 def cart(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    return {
+        "cart": SimpleLazyObject(lambda: Cart(request)),
+        "cart_summary": get_cart_summary(request.session),
+    }
@@ -1,4 +1,8 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from coupons.forms import CouponApplyForm
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.http import require_POST
 from shop.models import Product
@@ -31,22 +35,27 @@ def cart_remove(request, product_id):
     return redirect("cart:cart_detail")
 
 
-def cart_detail(request):
-    cart = Cart(request)
-    for item in cart:
-        item["update_quantity_form"] = CartAddProductForm(
-            initial={"quantity": item["quantity"], "override": True}
+async def cart_detail(request):
+    # Loading the session and the cart lines are blocking ORM calls
+    cart = await sync_to_async(Cart)(request)
+    product_ids = [int(pid) for pid in cart.cart]
+    r = Recommender()
+    lines, suggested_ids = await asyncio.gather(
+        sync_to_async(lambda: cart.lines)(),
+        r.lookup_ids_for(
+            product_ids, max_results=4, use_asyncio=isinstance(request, ASGIRequest)
+        ),
+    )
+    for line in lines:
+        line.update_quantity_form = CartAddProductForm(
+            initial={"quantity": line.quantity, "override": True}
         )
     coupon_apply_form = CouponApplyForm()
+    recommended_products = await sync_to_async(r.get_suggested_products)(
+        product_ids, suggested_ids, 4
+    )
 
-    r = Recommender()
-    cart_products = [item["product"] for item in cart]
-    if cart_products:
-        recommended_products = r.suggest_products_for(cart_products, max_results=4)
-    else:
-        recommended_products = []
-
-    return render(
+    return await sync_to_async(render)(
         request,
         "cart/detail.html",
         {
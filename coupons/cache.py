@@ -0,0 +1,89 @@
+"""
+Shared cache of valid coupons, keyed by id and by (case-insensitive) code.
+
+Only coupons that are active and inside their validity window are cached,
+and each entry expires no later than the coupon's ``valid_to``. Saving or
+deleting a coupon drops its entries (see ``coupons.signals``).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Coupon
+
+
+def coupon_id_key(coupon_id):
+    return f"coupons:id:{coupon_id}"
+
+
+def coupon_code_key(code):
+    digest = hashlib.sha256(code.lower().encode()).hexdigest()
+    return f"coupons:code:{digest}"
+
+
+def is_valid(coupon, now=None):
+    now = now or timezone.now()
+    return coupon.active and coupon.valid_from <= now <= coupon.valid_to
+
+
+def cache_coupon(coupon):
+    """
+    Store a currently valid coupon until it expires (or the configured
+    timeout, whichever comes first). Invalid coupons are not cached.
+    """
+    now = timezone.now()
+    if not is_valid(coupon, now):
+        return
+    timeout = min(
+        (coupon.valid_to - now).total_seconds(), settings.COUPON_CACHE_TIMEOUT
+    )
+    if timeout <= 0:
+        return
+    cache.set_many(
+        {coupon_id_key(coupon.id): coupon, coupon_code_key(coupon.code): coupon},
+        timeout,
+    )
+
+
+def invalidate_coupon(coupon):
+    cache.delete_many([coupon_id_key(coupon.id), coupon_code_key(coupon.code)])
+
+
+def get_coupon(coupon_id):
+    """
+    Return the coupon with the given id, or ``None`` if it doesn't exist.
+    """
+    coupon = cache.get(coupon_id_key(coupon_id))
+    if coupon is not None:
+        return coupon
+    try:
+        coupon = Coupon.objects.get(id=coupon_id)
+    except Coupon.DoesNotExist:
+        return None
+    cache_coupon(coupon)
+    return coupon
+
+
+def get_valid_coupon(code):
+    """
+    Return the active coupon matching ``code`` (case-insensitively) that
+    is valid right now, or ``None``.
+    """
+    now = timezone.now()
+    coupon = cache.get(coupon_code_key(code))
+    if coupon is not None and is_valid(coupon, now):
+        return coupon
+    try:
+        coupon = Coupon.objects.get(
+            code__iexact=code,
+            valid_from__lte=now,
+            valid_to__gte=now,
+            active=True,
+        )
+    except Coupon.DoesNotExist:
+        return None
+    cache_coupon(coupon)
+    return coupon
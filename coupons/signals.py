@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_coupon
+from .models import Coupon
+
+
+@receiver(pre_save, sender=Coupon)
+def invalidate_previous_code(sender, instance, **kwargs):
+    # The code may change; drop the entry stored under the old one
+    if instance.pk:
+        previous = Coupon.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            invalidate_coupon(previous)
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_cached_coupon(sender, instance, **kwargs):
+    invalidate_coupon(instance)
@@ -1,25 +1,14 @@
 from django.shortcuts import redirect
-from django.utils import timezone
 from django.views.decorators.http import require_POST
+from .cache import get_valid_coupon
 from .forms import CouponApplyForm
-from .models import Coupon
 
 
 # Create your views here.
 @require_POST
 def coupon_apply(request):
-    now = timezone.now()
     form = CouponApplyForm(request.POST)
     if form.is_valid():
-        code = form.cleaned_data["code"]
-        try:
-            coupon = Coupon.objects.get(
-                code__iexact=code,
-                valid_from__lte=now,
-                valid_to__gte=now,
-                active=True,
-            )
-            request.session["coupon_id"] = coupon.id
-        except Coupon.DoesNotExist:
-            request.session["coupon_id"] = None
+        coupon = get_valid_coupon(form.cleaned_data["code"])
+        request.session["coupon_id"] = coupon.id if coupon else None
     return redirect("cart:cart_detail")
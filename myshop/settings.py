@@ -135,10 +135,37 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# ----------------------------
+# Shop
+# ----------------------------
+PRODUCT_LIST_PAGE_SIZE = config("PRODUCT_LIST_PAGE_SIZE", default=24, cast=int)
+PRODUCT_LIST_CACHE_TIMEOUT = config(
+    "PRODUCT_LIST_CACHE_TIMEOUT", default=60 * 60, cast=int
+)
+
 # ----------------------------
 # Cart
 # ----------------------------
 CART_SESSION_ID = "cart"
+CART_SUMMARY_SESSION_ID = "cart_summary"
+
+# Upper bound for caching a valid coupon; entries never outlive valid_to
+COUPON_CACHE_TIMEOUT = config("COUPON_CACHE_TIMEOUT", default=60 * 60, cast=int)
+
+# ----------------------------
+# Orders
+# ----------------------------
+# Admin CSV exports above this many orders are built in the background
+ORDER_EXPORT_BACKGROUND_THRESHOLD = config(
+    "ORDER_EXPORT_BACKGROUND_THRESHOLD", default=20000, cast=int
+)
+ORDER_EXPORT_ROOT = config(
+    "ORDER_EXPORT_ROOT", default=str(BASE_DIR / "var" / "exports")
+)
+# Confirmation and invoice emails sent per batch over one SMTP connection
+ORDER_EMAIL_BATCH_SIZE = config("ORDER_EMAIL_BATCH_SIZE", default=100, cast=int)
+# Rendered invoice PDFs, one directory per order
+INVOICE_ROOT = config("INVOICE_ROOT", default=str(BASE_DIR / "var" / "invoices"))
 
 # ----------------------------
 # Celery
@@ -152,6 +179,14 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_ALWAYS_EAGER = False
 CELERY_TASK_EAGER_PROPAGATES = False
+# Periodic jobs, run by `celery -A myshop beat`
+CELERY_BEAT_SCHEDULE = {
+    # Catch Stripe events whose processing task was lost or never published
+    "process-webhook-events": {
+        "task": "payment.tasks.process_webhook_events",
+        "schedule": config("PAYMENT_WEBHOOK_SWEEP_INTERVAL", default=60, cast=int),
+    },
+}
 
 # ----------------------------
 # Email (Yahoo SMTP)
@@ -186,6 +221,14 @@ STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY", default="")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
 STRIPE_API_VERSION = config("STRIPE_API_VERSION", default="2025-12-15.clover")
+# Shared API client: keep-alive pool size, timeouts (seconds) and retries
+STRIPE_API_BASE = config("STRIPE_API_BASE", default="")
+STRIPE_POOL_SIZE = config("STRIPE_POOL_SIZE", default=10, cast=int)
+STRIPE_CONNECT_TIMEOUT = config("STRIPE_CONNECT_TIMEOUT", default=3.0, cast=float)
+STRIPE_READ_TIMEOUT = config("STRIPE_READ_TIMEOUT", default=20.0, cast=float)
+STRIPE_MAX_NETWORK_RETRIES = config("STRIPE_MAX_NETWORK_RETRIES", default=2, cast=int)
+# Recorded webhook events applied per transaction by the background worker
+PAYMENT_WEBHOOK_BATCH_SIZE = config("PAYMENT_WEBHOOK_BATCH_SIZE", default=50, cast=int)
 
 if not DEBUG and (not STRIPE_PUBLISHABLE_KEY or not STRIPE_SECRET_KEY):
     raise RuntimeError("Stripe keys must be set in environment variables!")
@@ -193,12 +236,50 @@ if not DEBUG and (not STRIPE_PUBLISHABLE_KEY or not STRIPE_SECRET_KEY):
 if not DEBUG and not STRIPE_WEBHOOK_SECRET:
     raise RuntimeError("STRIPE_WEBHOOK_SECRET must be set in environment variables!")
 
+# Bearer token for scraping /metrics/; every request is refused when empty
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 # ----------------------------
 # Redis
 # ----------------------------
 REDIS_HOST = config("REDIS_HOST", default="localhost")
 REDIS_PORT = config("REDIS_PORT", default=6379, cast=int)
 REDIS_DB = 1
+REDIS_CONNECT_TIMEOUT = config("REDIS_CONNECT_TIMEOUT", default=0.5, cast=float)
+REDIS_SOCKET_TIMEOUT = config("REDIS_SOCKET_TIMEOUT", default=0.5, cast=float)
+REDIS_HEALTH_CHECK_INTERVAL = config(
+    "REDIS_HEALTH_CHECK_INTERVAL", default=30, cast=int
+)
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", default=50, cast=int)
+
+# Skip recommendation calls for a cooldown window after repeated Redis errors
+RECOMMENDER_BREAKER_THRESHOLD = config(
+    "RECOMMENDER_BREAKER_THRESHOLD", default=5, cast=int
+)
+RECOMMENDER_BREAKER_COOLDOWN = config(
+    "RECOMMENDER_BREAKER_COOLDOWN", default=30, cast=float
+)
+
+# Offline co-purchase index served when Redis is unavailable
+RECOMMENDER_INDEX_PATH = config(
+    "RECOMMENDER_INDEX_PATH", default=str(BASE_DIR / "var" / "copurchase.npz")
+)
+
+# ----------------------------
+# Cache
+# ----------------------------
+# Product listings and coupons are invalidated by signals in the process that
+# saves them, so the cache must be shared by every web and Celery worker.
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.redis.RedisCache"
+        ),
+        "LOCATION": config(
+            "CACHE_LOCATION", default=f"redis://{REDIS_HOST}:{REDIS_PORT}/2"
+        ),
+    }
+}
 
 PARLER_LANGUAGES = {
     None: (
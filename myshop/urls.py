@@ -9,13 +9,14 @@ from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns
 from django.utils.translation import gettext_lazy as _
 
-from payment import webhooks
+from payment import views as payment_views, webhooks
 
 urlpatterns = [
     # Needed for {% url 'set_language' %} and Django language switching
     path("i18n/", include("django.conf.urls.i18n")),
     # Keep webhooks OUTSIDE i18n so Stripe hits a stable URL
     path("payment/webhook/", webhooks.stripe_webhook, name="payment-webhook"),
+    path("metrics/", payment_views.metrics, name="metrics"),
 ]
 
 urlpatterns += i18n_patterns(
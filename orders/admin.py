@@ -1,11 +1,20 @@
-from django.contrib import admin
+import uuid
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from .models import Order, OrderItem
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-import csv
-from django.http import HttpResponse
-import datetime
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 
+from .exports import stream_csv
+from .paginators import EstimatedCountPaginator
+from .tasks import export_orders_csv
+
 
 def order_payment(obj):
     url = obj.get_stripe_url()
@@ -23,37 +32,69 @@ class OrderItemInline(admin.TabularInline):
     raw_id_fields = ["product"]
 
 
-def export_to_csv(modeladmin, request, queryset):
+def export_csv(modeladmin, request, queryset, include_items=False):
     opts = modeladmin.model._meta
-    content_disposition = f"attachment; filename={opts.verbose_name_plural}.csv"
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = content_disposition
-    writer = csv.writer(response)
-    fields = [
-        field
-        for field in opts.get_fields()
-        if not field.many_to_many and not field.one_to_many
-    ]
-
-    # Write a first riw with header information
-    writer.writerow([field.verbose_name for field in fields])
+    # Only "select all" can exceed one page; the task rebuilds that selection
+    # from the changelist filters in the query string instead of a pk list
+    if (
+        request.POST.get("select_across") == "1"
+        and queryset.count() > settings.ORDER_EXPORT_BACKGROUND_THRESHOLD
+    ):
+        # Too large to stream within a request: build a file in the background
+        filename = (
+            f"{opts.verbose_name_plural}-{timezone.now():%Y%m%d-%H%M%S}-"
+            f"{uuid.uuid4().hex[:8]}.csv.gz"
+        )
+        export_orders_csv.delay(
+            request.GET.urlencode(), request.user.pk, filename, include_items
+        )
+        url = reverse("orders:admin_order_export", args=[filename])
+        modeladmin.message_user(
+            request,
+            format_html(
+                "The export is being generated. It will be available "
+                '<a href="{}">here</a> in a few minutes.',
+                url,
+            ),
+            messages.INFO,
+        )
+        return None
+
+    response = StreamingHttpResponse(
+        stream_csv(queryset, include_items), content_type="text/csv"
+    )
+    response["Content-Disposition"] = (
+        f"attachment; filename={opts.verbose_name_plural}.csv"
+    )
+    return response
 
-    # Write data rows
-    for obj in queryset:
-        data_row = []
-        for field in fields:
-            value = getattr(obj, field.name)
-            if isinstance(value, datetime.datetime):
-                value = value.strftime("%d/%m/%Y")
-            data_row.append(value)
-        writer.writerow(data_row)
 
-    return response
+def export_to_csv(modeladmin, request, queryset):
+    return export_csv(modeladmin, request, queryset)
 
 
 export_to_csv.short_description = "Export to CSV"
 
 
+def export_to_csv_with_items(modeladmin, request, queryset):
+    return export_csv(modeladmin, request, queryset, include_items=True)
+
+
+export_to_csv_with_items.short_description = "Export to CSV with items"
+
+
+def retry_failed_emails(modeladmin, request, queryset):
+    count = queryset.filter(
+        Q(confirmation_failed__isnull=False) | Q(invoice_failed__isnull=False)
+    ).update(confirmation_failed=None, invoice_failed=None)
+    modeladmin.message_user(
+        request, f"{count} orders will be retried on the next email dispatch."
+    )
+
+
+retry_failed_emails.short_description = "Retry failed emails"
+
+
 def order_detail(obj):
     url = reverse("orders:admin_order_detail", args=[obj.id])
     return mark_safe(f'<a href="{url}">View</a>')
@@ -63,6 +104,14 @@ def order_pdf(obj):
     return mark_safe(f'<a href="{url}">PDF</a>')
 order_detail.short_description = "Invoice"
 
+def order_item_count(obj):
+    return obj.item_count
+
+
+order_item_count.short_description = "Items"
+order_item_count.admin_order_field = "item_count"
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = [
@@ -75,6 +124,9 @@ class OrderAdmin(admin.ModelAdmin):
         "city",
         "paid",
         order_payment,
+        "coupon",
+        order_item_count,
+        "total",
         "created",
         "updated",
         order_detail,
@@ -82,5 +134,32 @@ class OrderAdmin(admin.ModelAdmin):
     ]
 
     list_filter = ["paid", "created", "updated"]
+    list_select_related = ["coupon"]
+    # Drill down by the indexed -created column
+    date_hierarchy = "created"
+    paginator = EstimatedCountPaginator
+    # Skip the extra unfiltered COUNT(*) shown next to filtered results
+    show_full_result_count = False
     inlines = [OrderItemInline]
-    actions = [export_to_csv]
+    actions = [export_to_csv, export_to_csv_with_items, retry_failed_emails]
+
+    def get_queryset(self, request):
+        # A correlated subquery keeps the item count out of GROUP BY and
+        # lets COUNT(*) for pagination drop it
+        item_count = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .order_by()
+            .values("order")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(item_count=Coalesce(Subquery(item_count), 0))
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Items or the discount may have been edited
+        form.instance.update_totals()
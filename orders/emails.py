@@ -0,0 +1,220 @@
+"""
+Batched delivery of order confirmation and invoice emails.
+
+Pending messages are found from the ``confirmation_sent`` and
+``invoice_sent`` fields of :class:`~orders.models.Order` and sent in batches
+over one SMTP connection. Each order is marked as soon as its message is
+delivered, so a batch that fails halfway is retried without resending what
+already went out. Messages that can never be delivered are marked failed
+(``confirmation_failed``/``invoice_failed``) and left alone until an admin
+clears the mark.
+
+Dispatchers in different processes claim their batches in the database with
+a conditional UPDATE, so no two of them ever send the same message. Claims
+left behind by a dispatcher that died expire after ``CLAIM_TIMEOUT``.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPResponseException
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .invoices import get_invoice_pdf
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+
+def build_confirmation(order):
+    message = (
+        f"Dear {order.first_name},\n\n"
+        "Thank you for your order.\n\n"
+        f"Your order reference is #{order.id}.\n"
+        "We will notify you once payment is confirmed.\n\n"
+        "Kind regards,\n"
+        "Su Solutions"
+    )
+    return EmailMultiAlternatives(
+        subject=f"Order confirmation – Order #{order.id}",
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[order.email],
+        reply_to=[settings.DEFAULT_FROM_EMAIL],
+    )
+
+
+def build_invoice(order):
+    email = EmailMultiAlternatives(
+        subject=f"Su Solutions Shop – Invoice no. {order.id}",
+        body="Please find attached the invoice for your recent purchase.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[order.email],
+    )
+    # Reuses the stored invoice when the admin already rendered it
+    email.attach(f"order_{order.id}.pdf", get_invoice_pdf(order), "application/pdf")
+    return email
+
+
+# kind: (field marking delivery, field marking failure, extra filter,
+# message builder)
+EMAIL_KINDS = {
+    "confirmation": (
+        "confirmation_sent",
+        "confirmation_failed",
+        {},
+        build_confirmation,
+    ),
+    "invoice": ("invoice_sent", "invoice_failed", {"paid": True}, build_invoice),
+}
+
+
+def get_pending(kind):
+    field, _, filters, _ = EMAIL_KINDS[kind]
+    return Order.objects.filter(**filters, **{f"{field}__isnull": True})
+
+
+def get_claimable(kind):
+    """
+    Return the pending ``kind`` orders not claimed by a live dispatcher
+    and not marked failed.
+    """
+    _, failed_field, _, _ = EMAIL_KINDS[kind]
+    expired = timezone.now() - CLAIM_TIMEOUT
+    return get_pending(kind).filter(
+        Q(email_claim__isnull=True) | Q(email_claimed__lt=expired),
+        **{f"{failed_field}__isnull": True},
+    )
+
+
+def claim_batch(kind, token, batch_size, exclude=()):
+    """
+    Claim up to ``batch_size`` pending ``kind`` orders for ``token``.
+    Returns ``(found, claimed)``: whether any candidates were found, and
+    the orders actually claimed, which may be fewer when another
+    dispatcher got to some first.
+    """
+    ids = list(
+        get_claimable(kind)
+        .exclude(id__in=exclude)
+        .order_by("id")
+        .values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return False, []
+    # Only rows still pending and unclaimed are taken
+    get_claimable(kind).filter(id__in=ids).update(
+        email_claim=token, email_claimed=timezone.now()
+    )
+    return True, list(
+        Order.objects.filter(id__in=ids, email_claim=token).order_by("id")
+    )
+
+
+def release_claims(token):
+    Order.objects.filter(email_claim=token).update(email_claim=None, email_claimed=None)
+
+
+def send_batch(connection, kind, orders):
+    """
+    Send the ``kind`` email of each order over ``connection`` and mark it
+    delivered. Returns ``(sent, skipped_ids)``; orders whose message could
+    not be built or was permanently refused by the server (5xx) are
+    skipped and marked failed, so later dispatches leave them alone.
+    Connection errors and temporary failures propagate so the caller can
+    retry.
+    """
+    field, failed_field, _, build = EMAIL_KINDS[kind]
+    sent, skipped = 0, []
+    for order in orders:
+        try:
+            email = build(order)
+        except Exception:
+            logger.exception("Could not build %s email for order %s", kind, order.id)
+            skipped.append(order.id)
+            continue
+        try:
+            connection.send_messages([email])
+        except SMTPRecipientsRefused:
+            logger.warning("Recipient refused for %s of order %s", kind, order.id)
+            skipped.append(order.id)
+            continue
+        except SMTPResponseException as exc:
+            if exc.smtp_code < 500:
+                raise
+            # e.g. 552 for an oversized attachment; retrying won't help
+            logger.warning(
+                "Server rejected %s of order %s: %s %s",
+                kind,
+                order.id,
+                exc.smtp_code,
+                exc.smtp_error,
+            )
+            skipped.append(order.id)
+            continue
+        Order.objects.filter(id=order.id).update(
+            **{field: timezone.now()}, email_claim=None, email_claimed=None
+        )
+        sent += 1
+    if skipped:
+        Order.objects.filter(id__in=skipped).update(
+            **{failed_field: timezone.now()}, email_claim=None, email_claimed=None
+        )
+    return sent, skipped
+
+
+def drain(connection=None, batch_size=None, skipped=None):
+    """
+    Send every pending email, ``batch_size`` orders at a time, over one
+    connection. Returns ``{kind: sent}``. Each batch is claimed first, so
+    concurrent calls split the pending orders between them. The ids of
+    skipped orders are collected in ``skipped`` (``{kind: set}``); they are
+    marked failed and not tried again.
+    """
+    batch_size = batch_size or settings.ORDER_EMAIL_BATCH_SIZE
+    connection = connection or get_connection()
+    skipped = {} if skipped is None else skipped
+    totals = dict.fromkeys(EMAIL_KINDS, 0)
+    token = uuid.uuid4().hex
+    opened = False
+    try:
+        for kind in EMAIL_KINDS:
+            kind_skipped = skipped.setdefault(kind, set())
+            while True:
+                found, batch = claim_batch(kind, token, batch_size, kind_skipped)
+                if not found:
+                    break
+                if not batch:
+                    # Another dispatcher claimed these first; look further
+                    continue
+                # Only connect once there is something to send
+                if not opened:
+                    connection.open()
+                    opened = True
+                sent, batch_skipped = send_batch(connection, kind, batch)
+                release_claims(token)
+                totals[kind] += sent
+                kind_skipped.update(batch_skipped)
+                logger.info(
+                    "Sent %s %s emails (%s skipped)", sent, kind, len(batch_skipped)
+                )
+    finally:
+        # Hand back whatever a failed batch left unsent
+        release_claims(token)
+        if opened:
+            connection.close()
+    return totals
+
+
+def dispatch_pending(batch_size=None):
+    """
+    Send all pending emails that no other dispatcher has claimed.
+    Returns ``{kind: sent}``.
+    """
+    return drain(batch_size=batch_size)
@@ -0,0 +1,145 @@
+"""
+Chunked CSV export of orders.
+
+Rows are read as value tuples in primary-key order, ``chunk_size`` orders
+at a time, with related data joined in the same query, so memory use stays
+flat however many orders are exported.
+"""
+
+import csv
+import datetime
+import gzip
+
+from django.conf import settings
+from django.utils.translation import get_language
+
+from shop.models import Product
+
+from .models import OrderItem
+
+# Related fields exported through a lookup instead of their raw id
+RELATED_LOOKUPS = {"coupon": ("coupon__code", "coupon")}
+
+ITEM_HEADERS = ["product id", "product", "price", "quantity", "cost"]
+
+
+class Echo:
+    """
+    File-like object that returns what is written, for streaming csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_columns(model):
+    """
+    Return ``(lookups, headers)`` for the concrete fields of ``model``,
+    leaving out non-editable bookkeeping fields other than the automatic
+    timestamps.
+    """
+    lookups, headers = [], []
+    for field in model._meta.get_fields():
+        if field.many_to_many or field.one_to_many or not field.concrete:
+            continue
+        if not field.editable and not (
+            getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+        ):
+            continue
+        if field.name in RELATED_LOOKUPS:
+            lookup, header = RELATED_LOOKUPS[field.name]
+        elif field.is_relation:
+            lookup, header = field.attname, field.verbose_name
+        else:
+            lookup, header = field.name, field.verbose_name
+        lookups.append(lookup)
+        headers.append(str(header))
+    return lookups, headers
+
+
+def format_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%d/%m/%Y")
+    return value
+
+
+def iter_chunks(queryset, lookups, chunk_size):
+    """
+    Yield lists of value rows, walking the queryset by primary key.
+    The primary key must be the first lookup.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*lookups)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def get_items(order_ids):
+    """
+    Return ``{order_id: [item row, ...]}`` for the given orders, with
+    product names in the active language, using two queries.
+    """
+    items = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("order_id", "id")
+        .values_list("order_id", "product_id", "price", "quantity")
+    )
+    names = dict(
+        Product._parler_meta.root_model.objects.filter(
+            master_id__in={item[1] for item in items},
+            language_code=get_language() or settings.LANGUAGE_CODE,
+        ).values_list("master_id", "name")
+    )
+    by_order = {}
+    for order_id, product_id, price, quantity in items:
+        by_order.setdefault(order_id, []).append(
+            [product_id, names.get(product_id, ""), price, quantity, price * quantity]
+        )
+    return by_order
+
+
+def iter_rows(queryset, include_items=False, chunk_size=2000):
+    """
+    Yield the header row and then one row per object, or one row per
+    order item (order columns repeated) when ``include_items`` is set.
+    """
+    lookups, headers = get_columns(queryset.model)
+    lookups = ["pk"] + lookups
+    yield headers + (ITEM_HEADERS if include_items else [])
+
+    for rows in iter_chunks(queryset, lookups, chunk_size):
+        items = get_items([row[0] for row in rows]) if include_items else {}
+        for row in rows:
+            data = [format_value(value) for value in row[1:]]
+            if not include_items:
+                yield data
+                continue
+            for item in items.get(row[0], [[""] * len(ITEM_HEADERS)]):
+                yield data + item
+
+
+def stream_csv(queryset, include_items=False):
+    """
+    Yield CSV-encoded lines, for a StreamingHttpResponse.
+    """
+    writer = csv.writer(Echo())
+    for row in iter_rows(queryset, include_items):
+        yield writer.writerow(row)
+
+
+def write_csv_gzip(queryset, path, include_items=False):
+    """
+    Write the export to a gzip-compressed file; returns the number of rows.
+    """
+    count = 0
+    with gzip.open(path, "wt", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        for row in iter_rows(queryset, include_items):
+            writer.writerow(row)
+            count += 1
+    return count - 1
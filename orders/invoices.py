@@ -0,0 +1,267 @@
+"""
+Invoice PDFs, rendered once and kept in a content-addressed file store.
+
+Each invoice is stored as ``INVOICE_ROOT/<order id>/<language>/<digest>.pdf``.
+The digest covers the order fields printed on the invoice, the language and
+the version of the template and stylesheet, so a stored file is reused until
+one of them changes and is then replaced by a fresh render. Each language
+keeps its own file, so renders in one language never prune another's.
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+import weasyprint
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import get_template, render_to_string
+from django.utils.translation import get_language
+from weasyprint.text.fonts import FontConfiguration
+
+from shop.models import Product
+
+from .models import OrderItem
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = "orders/order/pdf.html"
+STYLESHEET = "css/pdf.css"
+
+_template_version = {}
+
+
+def get_template_version():
+    """
+    Return ``(digest, mtime)`` for the invoice template and stylesheet.
+    The digest is recomputed only when one of the files is modified.
+    """
+    paths = [get_template(TEMPLATE_NAME).origin.name, finders.find(STYLESHEET)]
+    stats = tuple(
+        (path, os.stat(path).st_mtime_ns) if path else (None, 0) for path in paths
+    )
+    if stats not in _template_version:
+        digest = hashlib.sha256()
+        for path, _ in stats:
+            if path:
+                digest.update(Path(path).read_bytes())
+            digest.update(b"\0")
+        _template_version.clear()
+        _template_version[stats] = (
+            digest.hexdigest(),
+            max(mtime for _, mtime in stats) / 1e9,
+        )
+    return _template_version[stats]
+
+
+def get_invoice_digest(order):
+    """
+    Return the content address of the invoice of ``order``.
+    """
+    template_digest, _ = get_template_version()
+    parts = [
+        order.pk,
+        order.updated.isoformat(),
+        order.paid,
+        order.total,
+        order.discount,
+        order.coupon_id,
+        get_language() or settings.LANGUAGE_CODE,
+        template_digest,
+    ]
+    key = "|".join(str(part) for part in parts)
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def get_invoice_last_modified(order):
+    """
+    Return the timestamp of the latest change to the order or template.
+    """
+    _, template_mtime = get_template_version()
+    return max(order.updated.timestamp(), template_mtime)
+
+
+def get_invoice_path(order):
+    language = get_language() or settings.LANGUAGE_CODE
+    return (
+        Path(settings.INVOICE_ROOT)
+        / str(order.pk)
+        / language
+        / f"{get_invoice_digest(order)}.pdf"
+    )
+
+
+class InvoiceRenderer:
+    """
+    Render invoices with state that is expensive to rebuild: the font
+    configuration and the parsed stylesheet are created once, and local
+    resources (static files, ``file://`` URLs) are read from disk once and
+    served from memory afterwards.
+    """
+
+    def __init__(self):
+        self.base_url = str(settings.BASE_DIR)
+        self.font_config = FontConfiguration()
+        self._resources = {}
+        self._lock = threading.Lock()
+
+        css_path = finders.find(STYLESHEET)
+        if not css_path:
+            logger.warning("%s not found; generating invoices without CSS", STYLESHEET)
+        self.stylesheets = (
+            [
+                weasyprint.CSS(
+                    filename=css_path,
+                    font_config=self.font_config,
+                    url_fetcher=self.url_fetcher,
+                )
+            ]
+            if css_path
+            else []
+        )
+
+    def get_local_path(self, url):
+        parts = urlsplit(url)
+        if parts.path.startswith(settings.STATIC_URL):
+            return finders.find(parts.path[len(settings.STATIC_URL) :])
+        if parts.scheme == "file":
+            return url2pathname(parts.path)
+        return None
+
+    def url_fetcher(self, url, *args, **kwargs):
+        path = self.get_local_path(url)
+        if not path:
+            return weasyprint.default_url_fetcher(url, *args, **kwargs)
+        if path not in self._resources:
+            self._resources[path] = Path(path).read_bytes()
+        return {
+            "string": self._resources[path],
+            "mime_type": mimetypes.guess_type(path)[0],
+            "redirected_url": url,
+        }
+
+    def render(self, order):
+        """
+        Render the invoice of ``order`` and return the PDF bytes.
+        """
+        prefetch_invoice_data(order)
+        html = render_to_string(TEMPLATE_NAME, {"order": order})
+        out = BytesIO()
+        # Rendering shares the font configuration; one render at a time
+        with self._lock:
+            weasyprint.HTML(
+                string=html, base_url=self.base_url, url_fetcher=self.url_fetcher
+            ).write_pdf(out, stylesheets=self.stylesheets, font_config=self.font_config)
+        pdf = out.getvalue()
+        if not pdf:
+            raise RuntimeError(f"Generated invoice PDF is empty for order {order.pk}")
+        return pdf
+
+
+_renderer = None
+_renderer_version = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """
+    Return the process-wide renderer, rebuilt when the template or
+    stylesheet changes.
+    """
+    global _renderer, _renderer_version
+    version, _ = get_template_version()
+    if _renderer is None or version != _renderer_version:
+        with _renderer_lock:
+            if _renderer is None or version != _renderer_version:
+                _renderer = InvoiceRenderer()
+                _renderer_version = version
+    return _renderer
+
+
+def prefetch_invoice_data(order):
+    """
+    Load the coupon, the items and their products with translations, so
+    rendering the invoice template runs no further queries.
+    """
+    prefetch_related_objects(
+        [order],
+        "coupon",
+        Prefetch("items", queryset=OrderItem.objects.order_by("id")),
+        Prefetch("items__product", queryset=Product.objects.with_translations()),
+    )
+
+
+def render_invoice(order):
+    """
+    Render the invoice of ``order`` with the shared renderer.
+    """
+    return get_renderer().render(order)
+
+
+def store_invoice(path, pdf):
+    """
+    Write ``pdf`` to ``path`` atomically and remove stale invoices of the
+    same order and language.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(pdf)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    for stale in path.parent.glob("*.pdf"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+
+def get_invoice(order):
+    """
+    Return the path of the stored invoice of ``order``, rendering it first
+    if the order or the template changed since it was last stored.
+    """
+    path = get_invoice_path(order)
+    if not path.is_file():
+        store_invoice(path, render_invoice(order))
+        logger.info("Rendered invoice for order %s (%s)", order.pk, path.name)
+    return path
+
+
+def delete_invoices(order_id):
+    """
+    Remove every stored invoice of the order with ``order_id``.
+    """
+    shutil.rmtree(Path(settings.INVOICE_ROOT) / str(order_id), ignore_errors=True)
+
+
+def open_invoice(order):
+    """
+    Return the stored invoice of ``order`` opened for reading. A file
+    pruned by a concurrent render after the change of the order is
+    rendered again.
+    """
+    try:
+        return get_invoice(order).open("rb")
+    except FileNotFoundError:
+        path = get_invoice_path(order)
+        store_invoice(path, render_invoice(order))
+        return path.open("rb")
+
+
+def get_invoice_pdf(order):
+    """
+    Return the invoice of ``order`` as bytes.
+    """
+    with open_invoice(order) as fh:
+        return fh.read()
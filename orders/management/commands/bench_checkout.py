@@ -0,0 +1,104 @@
+import statistics
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import translation
+
+from orders.models import Order
+from orders.views import order_create
+from shop.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark order_create for carts of different sizes. Every checkout "
+        "commits, as in production; the orders and products are deleted at "
+        "the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lines",
+            type=int,
+            nargs="+",
+            default=[1, 20, 100],
+            help="Cart sizes (number of distinct products) to benchmark.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Checkouts per cart size."
+        )
+
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        category, products = self.create_products(max(options["lines"]))
+        order_ids = []
+        try:
+            # Benchmark orders must not reach the email dispatcher
+            with mock.patch("orders.views.order_created"):
+                for lines in options["lines"]:
+                    self.run(products[:lines], options["repeat"], order_ids)
+        finally:
+            Order.objects.filter(id__in=order_ids).delete()
+            # Deleting the category cascades to its products
+            category.delete()
+
+    def create_products(self, count):
+        category = Category()
+        category.set_current_language(settings.LANGUAGE_CODE)
+        category.name = category.slug = "bench-checkout"
+        category.save()
+        products = []
+        for i in range(count):
+            product = Product(category=category, price=Decimal("9.99"))
+            product.set_current_language(settings.LANGUAGE_CODE)
+            product.name = product.slug = f"bench-checkout-{i}"
+            product.save()
+            products.append(product)
+        return category, products
+
+    def make_request(self, factory, products):
+        request = factory.post(
+            "/orders/create/",
+            {
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "email": "bench@example.com",
+                "address": "1 Main St",
+                "postal_code": "10001",
+                "city": "New York",
+            },
+        )
+        request.session = SessionStore()
+        request.session[settings.CART_SESSION_ID] = {
+            str(p.id): {"quantity": 1, "price": str(p.price)} for p in products
+        }
+        return request
+
+    def run(self, products, repeat, order_ids):
+        factory = RequestFactory()
+        # Warm up template and query caches before timing
+        request = self.make_request(factory, products)
+        order_create(request)
+        order_ids.append(request.session.get("order_id"))
+        timings = []
+        for _ in range(repeat):
+            request = self.make_request(factory, products)
+            started = time.perf_counter()
+            response = order_create(request)
+            timings.append((time.perf_counter() - started) * 1000)
+            order_ids.append(request.session.get("order_id"))
+            if response.status_code != 302:
+                self.stderr.write(f"Unexpected status {response.status_code}")
+                return
+
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{len(products):4d} lines: mean {statistics.mean(timings):7.2f} ms  "
+            f"p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms"
+        )
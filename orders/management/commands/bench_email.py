@@ -0,0 +1,141 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.emails import build_confirmation, drain
+from orders.models import Order
+
+
+class Rollback(Exception):
+    pass
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server that accepts and discards every message. The
+    greeting is delayed by ``server.connect_delay`` to stand in for the
+    TLS handshake and login of a real relay.
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        time.sleep(self.server.connect_delay)
+        self.reply("220 localhost sink")
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif command == b"DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.messages += 1
+                self.reply("250 OK")
+            elif command == b"QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay):
+        super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+        self.connect_delay = connect_delay
+        self.messages = 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark confirmation emails against a local SMTP sink: one "
+        "connection per message against the batched dispatcher. Orders are "
+        "created inside a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages", type=int, default=200, help="Number of orders to email."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="Dispatcher batch size."
+        )
+        parser.add_argument(
+            "--connect-delay",
+            type=float,
+            default=50,
+            help="Simulated connection setup time in milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(options["connect_delay"] / 1000)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        host, port = sink.server_address
+
+        def connect():
+            return get_connection(
+                "django.core.mail.backends.smtp.EmailBackend",
+                host=host,
+                port=port,
+                username="",
+                password="",
+                use_tls=False,
+                use_ssl=False,
+            )
+
+        try:
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(
+                    Order(
+                        first_name="Bench",
+                        last_name="Mark",
+                        email=f"bench{i}@example.com",
+                        address="1 Main St",
+                        postal_code="10001",
+                        city="New York",
+                    )
+                    for i in range(options["messages"])
+                )
+                ids = [order.id for order in orders]
+                # Leave other pending emails out of the measurement
+                now = timezone.now()
+                Order.objects.exclude(id__in=ids).update(
+                    confirmation_sent=now, invoice_sent=now
+                )
+                self.run(ids, connect, options["batch_size"], sink)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+    def run(self, ids, connect, batch_size, sink):
+        # One connection per message, as the per-order task used to do
+        started = time.perf_counter()
+        for order in Order.objects.filter(id__in=ids):
+            connection = connect()
+            connection.send_messages([build_confirmation(order)])
+            connection.close()
+        self.report("per message", len(ids), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        sent = drain(connect(), batch_size=batch_size)["confirmation"]
+        self.report(f"batched ({batch_size})", sent, time.perf_counter() - started)
+        self.stdout.write(f"SMTP sink received {sink.messages} messages.")
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(
+            f"{label:>16}: {count} messages in {elapsed:.2f}s, "
+            f"{count / elapsed:.1f} messages/s"
+        )
@@ -0,0 +1,79 @@
+import time
+
+import weasyprint
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+
+from orders.invoices import STYLESHEET, TEMPLATE_NAME, InvoiceRenderer
+from orders.models import Order
+
+
+def render_cold(order):
+    """
+    Render the way the views used to: a fresh stylesheet and font setup,
+    the default URL fetcher and lazy item queries.
+    """
+    html = render_to_string(TEMPLATE_NAME, {"order": order})
+    css_path = finders.find(STYLESHEET)
+    stylesheets = [weasyprint.CSS(css_path)] if css_path else []
+    return weasyprint.HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(
+        stylesheets=stylesheets
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark invoice rendering on a single core: a fresh setup per "
+        "render against the shared warm renderer. Nothing is stored."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders", type=int, default=20, help="Number of orders to render."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Passes over the orders."
+        )
+
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        order_ids = list(
+            Order.objects.order_by("-id").values_list("id", flat=True)[
+                : options["orders"]
+            ]
+        )
+        if not order_ids:
+            raise CommandError("No orders to render.")
+
+        renderer = InvoiceRenderer()
+        results = {}
+        for label, render in (("cold", render_cold), ("warm", renderer.render)):
+            # Reload the orders on each pass so no prefetched data carries over
+            queries = 0
+            renders = 0
+            elapsed = 0.0
+            for _ in range(options["repeat"]):
+                for order in Order.objects.filter(id__in=order_ids):
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.process_time()
+                        render(order)
+                        elapsed += time.process_time() - started
+                    queries += len(ctx.captured_queries)
+                    renders += 1
+            results[label] = renders / elapsed if elapsed else float("inf")
+            self.stdout.write(
+                f"{label}: {renders} renders, {results[label]:.1f} renders/s "
+                f"(CPU), {queries / renders:.1f} queries/render"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Warm renderer: {results['warm'] / results['cold']:.2f}x "
+                "the cold throughput."
+            )
+        )
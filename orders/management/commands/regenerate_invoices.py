@@ -0,0 +1,164 @@
+import datetime
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import translation
+
+# Models are imported inside the functions: spawned workers import this
+# module to unpickle init_worker, before Django is set up
+
+
+def init_worker():
+    # Spawned workers start without Django; each opens its own connection
+    django.setup()
+
+
+def render_chunk(order_ids, language_code, force):
+    """
+    Render and store the invoices of ``order_ids`` in a worker process.
+    Returns ``(rendered, skipped, failures)``.
+    """
+    from orders.invoices import get_invoice_path, render_invoice, store_invoice
+    from orders.models import Order
+
+    rendered, skipped, failures = 0, 0, []
+    with translation.override(language_code):
+        for order in Order.objects.filter(id__in=order_ids):
+            try:
+                path = get_invoice_path(order)
+                if not force and path.is_file():
+                    skipped += 1
+                    continue
+                store_invoice(path, render_invoice(order))
+                rendered += 1
+            except Exception as exc:
+                failures.append((order.id, f"{type(exc).__name__}: {exc}"))
+    return rendered, skipped, failures
+
+
+class Command(BaseCommand):
+    help = (
+        "Render and store invoice PDFs for a date range or a list of order "
+        "ids, in parallel across a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ids", type=int, nargs="+", help="Order ids to regenerate."
+        )
+        parser.add_argument(
+            "--since",
+            type=datetime.date.fromisoformat,
+            help="Only orders created on or after this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--until",
+            type=datetime.date.fromisoformat,
+            help="Only orders created on or before this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--include-unpaid",
+            action="store_true",
+            help="Also render invoices of orders that are not paid.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Render again even if an up-to-date invoice is stored.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes (default: one per core).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of orders handed to a worker at a time.",
+        )
+
+    def handle(self, *args, **options):
+        from orders.models import Order
+
+        workers = options["workers"]
+        chunk_size = options["chunk_size"]
+        if workers < 1 or chunk_size < 1:
+            raise CommandError("--workers and --chunk-size must be positive.")
+        if not (options["ids"] or options["since"] or options["until"]):
+            raise CommandError("Give --ids, or a date range with --since/--until.")
+
+        orders = Order.objects.all()
+        if options["ids"]:
+            orders = orders.filter(id__in=options["ids"])
+        if options["since"]:
+            orders = orders.filter(created__date__gte=options["since"])
+        if options["until"]:
+            orders = orders.filter(created__date__lte=options["until"])
+        if not options["include_unpaid"]:
+            orders = orders.filter(paid=True)
+
+        language_code = translation.get_language()
+        rendered, skipped, failures = 0, 0, []
+        started = time.perf_counter()
+
+        # Workers are spawned, not forked, so none of them inherits the
+        # connection of this process
+        connections.close_all()
+        order_ids = orders.order_by("id").values_list("id", flat=True)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=init_worker
+        ) as pool:
+            pending = set()
+
+            def collect(return_when):
+                nonlocal pending, rendered, skipped
+                done, pending = wait(pending, return_when=return_when)
+                for future in done:
+                    chunk_rendered, chunk_skipped, chunk_failures = future.result()
+                    rendered += chunk_rendered
+                    skipped += chunk_skipped
+                    failures.extend(chunk_failures)
+                    for order_id, error in chunk_failures:
+                        self.stderr.write(f"Order {order_id}: {error}")
+                if done:
+                    self.stdout.write(
+                        f"  {rendered + skipped + len(failures)} orders processed..."
+                    )
+
+            # Each chunk is a materialized keyset page, so no read cursor
+            # stays open (and holds the SQLite lock) while workers write
+            last_id = 0
+            while True:
+                chunk = list(order_ids.filter(id__gt=last_id)[:chunk_size])
+                if not chunk:
+                    break
+                last_id = chunk[-1]
+                pending.add(
+                    pool.submit(render_chunk, chunk, language_code, options["force"])
+                )
+                # Keep a bounded number of chunks in flight
+                if len(pending) >= workers * 2:
+                    collect(FIRST_COMPLETED)
+            while pending:
+                collect(FIRST_COMPLETED)
+
+        elapsed = time.perf_counter() - started
+        processed = rendered + skipped + len(failures)
+        rate = rendered / elapsed if elapsed else 0.0
+        summary = (
+            f"{processed} orders in {elapsed:.1f}s with {workers} workers: "
+            f"{rendered} rendered ({rate:.1f}/s), {skipped} up to date, "
+            f"{len(failures)} failed."
+        )
+        if failures:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:32
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("orders", "Order")
+    cent = Decimal("0.01")
+    subtotals = Order.objects.annotate(
+        items_subtotal=Sum(
+            F("items__price") * F("items__quantity"), output_field=models.DecimalField()
+        )
+    ).values_list("id", "discount", "items_subtotal")
+    for order_id, discount, subtotal in subtotals.iterator():
+        subtotal = Decimal(subtotal or 0).quantize(cent, rounding=ROUND_HALF_UP)
+        discount_amount = (subtotal * Decimal(discount or 0) / Decimal(100)).quantize(
+            cent, rounding=ROUND_HALF_UP
+        )
+        Order.objects.filter(id=order_id).update(
+            subtotal=subtotal,
+            discount_amount=discount_amount,
+            total=subtotal - discount_amount,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0003_order_coupon_order_discount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="discount_amount",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                max_digits=10,
+                verbose_name="discount amount",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="subtotal",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                max_digits=10,
+                verbose_name="subtotal",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="total",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                max_digits=10,
+                verbose_name="total",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="address",
+            field=models.CharField(max_length=250, verbose_name="address"),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="city",
+            field=models.CharField(max_length=100, verbose_name="city"),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="email",
+            field=models.EmailField(max_length=254, verbose_name="email"),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="first_name",
+            field=models.CharField(max_length=50, verbose_name="first name"),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="last_name",
+            field=models.CharField(max_length=50, verbose_name="last name"),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="postal_code",
+            field=models.CharField(max_length=20, verbose_name="postal code"),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
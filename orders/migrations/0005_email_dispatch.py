@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:38
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_sent(apps, schema_editor):
+    # Existing orders were emailed by the per-order tasks already
+    Order = apps.get_model("orders", "Order")
+    Order.objects.update(confirmation_sent=F("created"))
+    Order.objects.filter(paid=True).update(invoice_sent=F("updated"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coupons", "0001_initial"),
+        ("orders", "0004_order_totals"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="confirmation_sent",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="confirmation sent"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="invoice_sent",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="invoice sent"
+            ),
+        ),
+        migrations.RunPython(backfill_sent, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("confirmation_sent__isnull", True)),
+                fields=["id"],
+                name="order_confirmation_pending",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("invoice_sent__isnull", True), ("paid", True)),
+                fields=["id"],
+                name="order_invoice_pending",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0005_email_dispatch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="email_claim",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=32,
+                null=True,
+                verbose_name="email claim",
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="email_claimed",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="email claimed"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0006_order_email_claim"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="confirmation_failed",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="confirmation failed"
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="invoice_failed",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="invoice failed"
+            ),
+        ),
+    ]
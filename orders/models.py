@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import models
-from decimal import Decimal
+from django.db.models import F, Q, Sum
+from decimal import ROUND_HALF_UP, Decimal
 from django.core.validators import MinValueValidator, MaxValueValidator
 from coupons.models import Coupon
 from django.utils.translation import gettext_lazy as _
@@ -29,28 +30,87 @@ class Order(models.Model):
         default=0,
         validators=[MinValueValidator(0), MaxValueValidator(100)],
     )
+    # Stored when the order is created so lists and reports can sort and
+    # filter on them; recompute with update_totals() if the items change
+    subtotal = models.DecimalField(
+        _("subtotal"), max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    discount_amount = models.DecimalField(
+        _("discount amount"), max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    total = models.DecimalField(
+        _("total"), max_digits=10, decimal_places=2, default=Decimal("0.00")
+    )
+    # Set by the email dispatcher once each message has been delivered
+    confirmation_sent = models.DateTimeField(
+        _("confirmation sent"), null=True, blank=True
+    )
+    invoice_sent = models.DateTimeField(_("invoice sent"), null=True, blank=True)
+    # Set when a message can never be delivered (refused recipient, permanent
+    # server error); the dispatcher skips the order until this is cleared
+    confirmation_failed = models.DateTimeField(
+        _("confirmation failed"), null=True, blank=True
+    )
+    invoice_failed = models.DateTimeField(_("invoice failed"), null=True, blank=True)
+    # Token of the dispatcher currently sending this order's emails, so
+    # concurrent workers never send the same message twice
+    email_claim = models.CharField(
+        _("email claim"), max_length=32, null=True, blank=True, editable=False
+    )
+    email_claimed = models.DateTimeField(
+        _("email claimed"), null=True, blank=True, editable=False
+    )
 
     class Meta:
         ordering = ["-created"]
         indexes = [
             models.Index(fields=["-created"]),
+            # Keep the dispatcher's pending queries small as orders pile up
+            models.Index(
+                fields=["id"],
+                condition=Q(confirmation_sent__isnull=True),
+                name="order_confirmation_pending",
+            ),
+            models.Index(
+                fields=["id"],
+                condition=Q(paid=True, invoice_sent__isnull=True),
+                name="order_invoice_pending",
+            ),
         ]
 
     def __str__(self):
         return f"Order {self.id}"
 
     def get_total_cost_before_discount(self):
-        return sum(item.get_cost() for item in self.items.all())
+        return self.subtotal
 
     def get_discount(self):
-        total_cost = self.get_total_cost_before_discount()
-        if self.discount:
-            return total_cost * (self.discount / Decimal(100))
-        return Decimal(0)
+        return self.discount_amount
 
     def get_total_cost(self):
-        total_cost = self.get_total_cost_before_discount()
-        return total_cost - self.get_discount()
+        return self.total
+
+    def set_totals(self, subtotal):
+        """
+        Set subtotal, discount amount and total from the items' subtotal.
+        """
+        cent = Decimal("0.01")
+        self.subtotal = Decimal(subtotal).quantize(cent, rounding=ROUND_HALF_UP)
+        self.discount_amount = (
+            self.subtotal * Decimal(self.discount or 0) / Decimal(100)
+        ).quantize(cent, rounding=ROUND_HALF_UP)
+        self.total = self.subtotal - self.discount_amount
+
+    def update_totals(self, save=True):
+        """
+        Recompute the stored totals from the items with a DB aggregate.
+        """
+        subtotal = self.items.aggregate(
+            subtotal=Sum(F("price") * F("quantity"), output_field=models.DecimalField())
+        )["subtotal"]
+        self.set_totals(subtotal or 0)
+        if save:
+            self.save(update_fields=["subtotal", "discount_amount", "total"])
 
     def get_stripe_url(self):
         if not self.stripe_id:
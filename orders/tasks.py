@@ -1,61 +1,88 @@
 # orders/tasks.py
 import logging
+import os
+from pathlib import Path
+from smtplib import SMTPException
 
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives, get_connection
+from django.http import HttpRequest, QueryDict
 
+from .emails import dispatch_pending
+from .exports import write_csv_gzip
 from .models import Order
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={"max_retries": 5, "countdown": 60},
-    rate_limit="5/m",
-)
-def order_created(self, order_id: int) -> int:
-    """
-    Send an email when an order is created (before payment).
-    """
-    try:
-        order = Order.objects.get(id=order_id)
-    except Order.DoesNotExist:
-        logger.warning("order_created: Order %s not found", order_id)
-        return 0
-
-    subject = f"Order confirmation – Order #{order.id}"
-    message = (
-        f"Dear {order.first_name},\n\n"
-        "Thank you for your order.\n\n"
-        f"Your order reference is #{order.id}.\n"
-        "We will notify you once payment is confirmed.\n\n"
-        "Kind regards,\n"
-        "Su Solutions"
-    )
+# Retries are safe: delivered messages are marked on the order, so a retry
+# only sends what is still pending
+EMAIL_TASK_OPTIONS = {
+    "autoretry_for": (SMTPException, OSError),
+    "retry_backoff": 30,
+    "retry_kwargs": {"max_retries": 5},
+}
 
-    from_email = settings.DEFAULT_FROM_EMAIL
 
-    # Reuse one SMTP connection per task execution
-    connection = get_connection()
+@shared_task(**EMAIL_TASK_OPTIONS)
+def dispatch_order_emails() -> dict:
+    """
+    Send all pending confirmation and invoice emails in batches over one
+    SMTP connection.
+    """
+    totals = dispatch_pending()
+    if totals:
+        logger.info("dispatch_order_emails: sent %s", totals)
+    return totals
+
+
+@shared_task(**EMAIL_TASK_OPTIONS)
+def order_created(order_id: int) -> dict:
+    """
+    Send the confirmation email of a new order (before payment), batched
+    with any other pending emails.
+    """
+    totals = dispatch_pending()
+    logger.info("order_created: order_id=%s sent=%s", order_id, totals)
+    return totals
 
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=message,
-        from_email=from_email,
-        to=[order.email],
-        reply_to=[from_email],
-        connection=connection,
-    )
 
-    sent = email.send(fail_silently=False)
+def get_changelist_queryset(query_string, user_id):
+    """
+    Return the orders the admin changelist shows ``user_id`` for the
+    changelist ``query_string``, with its filters, search and date
+    drill-down applied.
+    """
+    from django.contrib import admin
+    from django.contrib.auth import get_user_model
+
+    request = HttpRequest()
+    request.method = "GET"
+    request.GET = QueryDict(query_string)
+    request.user = get_user_model().objects.get(pk=user_id)
+    changelist = admin.site.get_model_admin(Order).get_changelist_instance(request)
+    return changelist.get_queryset(request)
+
 
-    logger.info(
-        "order_created: sent=%s order_id=%s to=%s",
-        sent,
-        order.id,
-        order.email,
+@shared_task(bind=True)
+def export_orders_csv(
+    self, query_string: str, user_id: int, filename: str, include_items: bool = False
+) -> int:
+    """
+    Write a gzip-compressed CSV export of the orders matching the admin
+    changelist ``query_string`` to ORDER_EXPORT_ROOT for staff to download.
+    Returns the number of rows.
+    """
+    root = Path(settings.ORDER_EXPORT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / filename
+    tmp_path = root / f".{filename}.tmp"
+
+    rows = write_csv_gzip(
+        get_changelist_queryset(query_string, user_id), tmp_path, include_items
     )
-    return 1 if sent else 0
+    # Only expose the file once it is complete
+    os.replace(tmp_path, path)
+
+    logger.info("export_orders_csv: wrote %s rows to %s", rows, path)
+    return rows
@@ -1,3 +1,83 @@
+from smtplib import SMTPRecipientsRefused
+
 from django.test import TestCase
 
-# Create your tests here.
+from .emails import claim_batch, drain, get_claimable, release_claims
+from .models import Order
+
+
+class FakeConnection:
+    """
+    Records sent messages and refuses those addressed to ``refused``.
+    """
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.sent = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.refused.intersection(message.to):
+                raise SMTPRecipientsRefused({})
+            self.sent.append(message)
+        return len(messages)
+
+
+def make_orders(count, **fields):
+    return [
+        Order.objects.create(
+            first_name="Ana",
+            last_name="Diaz",
+            email=f"ana{i}@example.com",
+            address="1 Main St",
+            postal_code="10001",
+            city="New York",
+            **fields,
+        )
+        for i in range(count)
+    ]
+
+
+class EmailDispatchTests(TestCase):
+    def test_two_dispatchers_split_a_batch(self):
+        orders = make_orders(4)
+
+        _, first = claim_batch("confirmation", "a" * 32, 3)
+        _, second = claim_batch("confirmation", "b" * 32, 3)
+
+        first_ids = {order.id for order in first}
+        second_ids = {order.id for order in second}
+        self.assertEqual(len(first_ids), 3)
+        self.assertFalse(first_ids & second_ids)
+        self.assertEqual(first_ids | second_ids, {order.id for order in orders})
+
+    def test_released_claims_are_claimable_again(self):
+        make_orders(2)
+        claim_batch("confirmation", "a" * 32, 2)
+        self.assertFalse(get_claimable("confirmation").exists())
+
+        release_claims("a" * 32)
+
+        self.assertEqual(get_claimable("confirmation").count(), 2)
+
+    def test_refused_recipient_is_not_retried(self):
+        good, bad = make_orders(2)
+        connection = FakeConnection(refused=[bad.email])
+
+        self.assertEqual(drain(connection)["confirmation"], 1)
+        self.assertEqual([m.to for m in connection.sent], [[good.email]])
+        bad.refresh_from_db()
+        self.assertIsNotNone(bad.confirmation_failed)
+        self.assertIsNone(bad.confirmation_sent)
+        self.assertIsNone(bad.email_claim)
+
+        # A later dispatch leaves the failed order alone until it is reset
+        self.assertEqual(drain(FakeConnection())["confirmation"], 0)
+        Order.objects.filter(id=bad.id).update(confirmation_failed=None)
+        self.assertEqual(drain(FakeConnection())["confirmation"], 1)
@@ -13,4 +13,9 @@ urlpatterns = [
     path(
         "admin/order/<int:order_id>/pdf/", views.admin_order_pdf, name="admin_order_pdf"
     ),
+    path(
+        "admin/exports/<str:filename>/",
+        views.admin_order_export,
+        name="admin_order_export",
+    ),
 ]
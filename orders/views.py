@@ -1,11 +1,16 @@
-import weasyprint
-from django.contrib.staticfiles import finders
-from django.http import HttpResponse
-from django.template.loader import render_to_string
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404
 from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import gettext as _
 from cart.cart import Cart
 from django.shortcuts import get_object_or_404, redirect, render
 from .forms import OrderCreateForm
+from .invoices import get_invoice_digest, get_invoice_last_modified, open_invoice
 from .models import Order, OrderItem
 from .tasks import order_created
 
@@ -17,33 +22,65 @@ def order_create(request):
         form = OrderCreateForm(request.POST)
 
         if form.is_valid():
-            # Save the order
-            order = form.save(commit=False)
-            if cart.coupon:
-                order.coupon = cart.coupon
-                order.discount = cart.coupon.discount
-            order.save()
-
-            # Create corresponding OrderItem objects
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item["product"],
-                    price=item["price"],
-                    quantity=item["quantity"],
-                )
+            # Cart lines carry the current product rows, fetched in one query
+            lines = cart.lines
+            unavailable = [line.product for line in lines if not line.product.available]
+            repriced = [
+                line.product for line in lines if line.price != line.product.price
+            ]
 
-            # Clear the cart AFTER saving order items
-            cart.clear()
-            # Launch asynchronous task to send order confirmation email
-            order_created.delay(order.id)
-            # set the order in the session
-            request.session["order_id"] = order.id
-            # Redirect to the payment processing
-            return redirect("payment:process")
+            if not cart.cart:
+                form.add_error(None, _("Your cart is empty."))
+            elif len(lines) != len(cart.cart):
+                # Products deleted since they were added have no line
+                cart.remove_missing()
+                form.add_error(
+                    None,
+                    _(
+                        "Some products in your cart are no longer available and "
+                        "have been removed. Please review your order."
+                    ),
+                )
+            elif unavailable:
+                form.add_error(
+                    None,
+                    _("Sorry, these products are no longer available: %(products)s")
+                    % {"products": ", ".join(p.name for p in unavailable)},
+                )
+            elif repriced:
+                cart.update_prices(repriced)
+                form.add_error(
+                    None, _("Some prices have changed. Please review your order.")
+                )
+            else:
+                with transaction.atomic():
+                    order = form.save(commit=False)
+                    coupon = cart.coupon
+                    if coupon:
+                        order.coupon = coupon
+                        order.discount = coupon.discount
+                    order.set_totals(sum(line.total_price for line in lines))
+                    order.save()
+                    OrderItem.objects.bulk_create(
+                        [
+                            OrderItem(
+                                order=order,
+                                product=line.product,
+                                price=line.price,
+                                quantity=line.quantity,
+                            )
+                            for line in lines
+                        ]
+                    )
+                    # Launch asynchronous task to send order confirmation email
+                    transaction.on_commit(lambda: order_created.delay(order.id))
 
-            # Optional: Redirect to prevent duplicate POSTs (good practice)
-            # return render(request, "orders/order/created.html", {"order": order})
+                # Clear the cart AFTER saving order items
+                cart.clear()
+                # set the order in the session
+                request.session["order_id"] = order.id
+                # Redirect to the payment processing
+                return redirect("payment:process")
 
     else:
         form = OrderCreateForm()
@@ -68,11 +105,33 @@ def admin_order_detail(request, order_id):
 @staff_member_required
 def admin_order_pdf(request, order_id):
     order = get_object_or_404(Order, id=order_id)
-    html = render_to_string("orders/order/pdf.html", {"order": order})
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'filename="order_{order.id}.pdf"'
-    weasyprint.HTML(string=html).write_pdf(
-        response,
-        stylesheets=[weasyprint.CSS(finders.find("css/pdf.css"))],
+    etag = quote_etag(get_invoice_digest(order))
+    last_modified = int(get_invoice_last_modified(order))
+
+    # Answer revalidations with 304 before touching the file store
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
     )
+    if response is None:
+        response = FileResponse(
+            open_invoice(order),
+            filename=f"order_{order.id}.pdf",
+            content_type="application/pdf",
+        )
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
     return response
+
+
+@staff_member_required
+def admin_order_export(request, filename):
+    path = Path(settings.ORDER_EXPORT_ROOT) / filename
+    if path.name != filename or filename.startswith(".") or not path.is_file():
+        raise Http404("Export not found (it may still be in progress).")
+    return FileResponse(
+        path.open("rb"),
+        as_attachment=True,
+        filename=filename,
+        content_type="application/gzip",
+    )
@@ -1,3 +1,48 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils.translation import gettext, gettext_lazy as _
 
-# Register your models here.
+from .events import replay_events
+from .models import StripeCoupon, WebhookEvent
+from .tasks import process_webhook_events
+
+
+@admin.action(description=_("Replay selected events"))
+def replay(modeladmin, request, queryset):
+    count = replay_events(queryset)
+    transaction.on_commit(process_webhook_events.delay)
+    modeladmin.message_user(
+        request, gettext("%(count)d events queued.") % {"count": count}
+    )
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = [
+        "event_id",
+        "type",
+        "status",
+        "order_id",
+        "attempts",
+        "lock_wait_ms",
+        "created",
+        "received",
+        "processed",
+    ]
+    list_filter = ["status", "type", "created"]
+    search_fields = ["event_id", "=order_id"]
+    date_hierarchy = "created"
+    readonly_fields = [field.name for field in WebhookEvent._meta.fields]
+    show_full_result_count = False
+    actions = [replay]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StripeCoupon)
+class StripeCouponAdmin(admin.ModelAdmin):
+    list_display = ["stripe_id", "coupon", "discount", "created"]
+    list_select_related = ["coupon"]
+    search_fields = ["stripe_id", "coupon__code"]
+    readonly_fields = ["coupon", "discount", "stripe_id", "created"]
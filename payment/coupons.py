@@ -0,0 +1,72 @@
+"""
+Stripe coupons for shop coupons, created once and reused.
+
+Every (coupon, discount) pair maps to one Stripe coupon with a deterministic
+id, recorded in :class:`~payment.models.StripeCoupon`. Concurrent first
+checkouts may both call Stripe, but they create the same coupon: the
+idempotency key makes the repeated request return the first response, and
+an id that already exists in Stripe is accepted as is.
+"""
+
+import logging
+
+import stripe
+from django.db import IntegrityError, transaction
+
+from .models import StripeCoupon
+from .stripe_client import get_stripe
+
+logger = logging.getLogger(__name__)
+
+
+def get_stripe_id(coupon, discount):
+    return f"shop-coupon-{coupon.pk}-{discount}off"
+
+
+def create_stripe_coupon(coupon, discount):
+    """
+    Create the Stripe coupon for ``coupon`` at ``discount`` percent off,
+    unless it already exists. Returns its Stripe id.
+    """
+    stripe_id = get_stripe_id(coupon, discount)
+    try:
+        get_stripe().v1.coupons.create(
+            params={
+                "id": stripe_id,
+                "name": coupon.code,
+                "percent_off": discount,
+                "duration": "once",
+            },
+            options={"idempotency_key": f"create-{stripe_id}"},
+        )
+    except stripe.error.InvalidRequestError as exc:
+        if exc.code != "resource_already_exists":
+            raise
+    else:
+        logger.info("Created Stripe coupon %s", stripe_id)
+    return stripe_id
+
+
+def get_stripe_coupon_id(coupon, discount):
+    """
+    Return the id of the Stripe coupon for ``coupon`` at ``discount``
+    percent off, creating it in Stripe the first time only.
+    """
+    stripe_id = (
+        StripeCoupon.objects.filter(coupon=coupon, discount=discount)
+        .values_list("stripe_id", flat=True)
+        .first()
+    )
+    if stripe_id:
+        return stripe_id
+
+    stripe_id = create_stripe_coupon(coupon, discount)
+    try:
+        with transaction.atomic():
+            StripeCoupon.objects.create(
+                coupon=coupon, discount=discount, stripe_id=stripe_id
+            )
+    except IntegrityError:
+        # A concurrent checkout recorded the same coupon first
+        pass
+    return stripe_id
@@ -0,0 +1,244 @@
+"""
+Stripe webhook inbox.
+
+The webhook only verifies and records events (see :func:`record_event`);
+:func:`process_pending` applies them in the background in the order Stripe
+created them. Stripe usually sends several events for one payment, and
+retries deliveries: the unique event id drops repeated deliveries, and the
+conditional paid-flag update turns the other events of an already paid order
+into no-ops.
+
+Workers claim each event with a conditional UPDATE from pending to
+processing, which works on every database, so concurrent workers never
+apply the same event twice. A claim left by a worker that died is taken
+over after ``CLAIM_TIMEOUT``.
+"""
+
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from orders.models import Order
+from shop.tasks import record_order_purchase
+
+from .models import WebhookEvent
+from .tasks import payment_completed
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+HANDLED_TYPES = {
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+    "payment_intent.succeeded",
+}
+
+
+def get_payment_reference(event_type, obj):
+    """
+    Return ``(order_id, payment_intent_id)`` for a payment event, or
+    ``None`` if the event does not mark an order as paid.
+    """
+    if event_type == "checkout.session.completed":
+        # For cards this is usually "paid". For async methods it may not be.
+        if obj.get("payment_status") != "paid":
+            logger.info(
+                "Checkout session not paid yet (status=%s)", obj.get("payment_status")
+            )
+            return None
+        order_id = (obj.get("metadata") or {}).get("order_id") or obj.get(
+            "client_reference_id"
+        )
+        payment_intent_id = obj.get("payment_intent")
+
+    elif event_type == "checkout.session.async_payment_succeeded":
+        order_id = (obj.get("metadata") or {}).get("order_id") or obj.get(
+            "client_reference_id"
+        )
+        payment_intent_id = obj.get("payment_intent")
+
+    elif event_type == "payment_intent.succeeded":
+        payment_intent_id = obj.get("id")
+        order_id = (obj.get("metadata") or {}).get("order_id")
+
+    else:
+        return None
+
+    if not order_id:
+        logger.warning("No order_id found in Stripe event (type=%s)", event_type)
+        return None
+    try:
+        return int(order_id), payment_intent_id
+    except (TypeError, ValueError):
+        logger.warning("Invalid order_id value: %r", order_id)
+        return None
+
+
+def record_event(event, payload):
+    """
+    Store a verified event. Returns ``(webhook_event, created)``; an event
+    already recorded is returned as stored.
+    """
+    event_type = event.get("type") or ""
+    obj = (event.get("data") or {}).get("object") or {}
+    reference = (
+        get_payment_reference(event_type, obj) if event_type in HANDLED_TYPES else None
+    )
+    try:
+        with transaction.atomic():
+            return (
+                WebhookEvent.objects.create(
+                    event_id=event["id"],
+                    type=event_type,
+                    created=datetime.datetime.fromtimestamp(
+                        event.get("created") or time.time(), tz=datetime.timezone.utc
+                    ),
+                    payload=payload,
+                    order_id=reference[0] if reference else None,
+                    # Events that mark no order as paid need no processing
+                    status=(
+                        WebhookEvent.Status.PENDING
+                        if reference
+                        else WebhookEvent.Status.SKIPPED
+                    ),
+                ),
+                True,
+            )
+    except IntegrityError:
+        return WebhookEvent.objects.get(event_id=event["id"]), False
+
+
+def handle_event(event):
+    """
+    Apply a recorded event and store its outcome in the same transaction.
+    Returns the resulting status.
+    """
+    started = time.perf_counter()
+    obj = (event.payload.get("data") or {}).get("object") or {}
+    reference = get_payment_reference(event.type, obj)
+    marked = 0
+    with transaction.atomic():
+        if reference is not None:
+            order_id, payment_intent_id = reference
+            # A single conditional UPDATE flips the paid flag, so duplicate
+            # events are no-ops
+            fields = {"paid": True, "updated": timezone.now()}
+            if payment_intent_id:
+                fields["stripe_id"] = payment_intent_id
+            update_started = time.perf_counter()
+            marked = Order.objects.filter(id=order_id, paid=False).update(**fields)
+            event.lock_wait_ms = (time.perf_counter() - update_started) * 1000
+            if marked:
+                # Side effects run as independent jobs once the flag is
+                # committed (robust: a broker error is logged instead of
+                # undoing the event)
+                transaction.on_commit(
+                    lambda: record_order_purchase.delay(order_id), robust=True
+                )
+                transaction.on_commit(
+                    lambda: payment_completed.delay(order_id), robust=True
+                )
+        updated = time.perf_counter()
+        event.status = (
+            WebhookEvent.Status.PROCESSED if marked else WebhookEvent.Status.SKIPPED
+        )
+        event.error = ""
+        event.processed = timezone.now()
+        event.save(
+            update_fields=["status", "error", "processed", "attempts", "lock_wait_ms"]
+        )
+    # Leaving the block commits and publishes the jobs
+    dispatched = time.perf_counter()
+
+    if marked:
+        logger.info("Order %s marked as PAID (pi=%s)", order_id, payment_intent_id)
+    elif reference is not None and not Order.objects.filter(id=order_id).exists():
+        logger.warning("Order %s not found (event %s)", order_id, event.event_id)
+    logger.info(
+        "Stripe event %s (%s) timings: update=%.1fms commit+dispatch=%.1fms",
+        event.event_id,
+        event.type,
+        (updated - started) * 1000,
+        (dispatched - updated) * 1000,
+    )
+    return event.status
+
+
+def get_claimable():
+    """
+    Return the events waiting for a worker: pending ones, and those whose
+    worker stopped before finishing them.
+    """
+    expired = timezone.now() - CLAIM_TIMEOUT
+    return WebhookEvent.objects.filter(
+        Q(status=WebhookEvent.Status.PENDING)
+        | Q(status=WebhookEvent.Status.PROCESSING, claimed__lt=expired)
+    )
+
+
+def claim_event(event):
+    """
+    Mark ``event`` as being processed by this worker. Returns ``False`` if
+    another worker claimed it first.
+    """
+    claimed = (
+        get_claimable()
+        .filter(id=event.id)
+        .update(status=WebhookEvent.Status.PROCESSING, claimed=timezone.now())
+    )
+    return bool(claimed)
+
+
+def process_events(events):
+    """
+    Claim and apply ``events`` one at a time, each committed on its own,
+    and store the outcome on the event. Events claimed by another worker
+    are left alone. Returns ``{status: count}``.
+    """
+    counts = {}
+    for event in events:
+        if not claim_event(event):
+            continue
+        event.attempts += 1
+        event.lock_wait_ms = None
+        try:
+            handle_event(event)
+        except Exception as exc:
+            logger.exception("Stripe event %s failed", event.event_id)
+            event.status = WebhookEvent.Status.FAILED
+            event.error = f"{type(exc).__name__}: {exc}"
+            event.save(update_fields=["status", "error", "attempts", "lock_wait_ms"])
+        counts[event.status] = counts.get(event.status, 0) + 1
+    return counts
+
+
+def process_pending(batch_size=None):
+    """
+    Apply pending events in creation order, ``batch_size`` at a time, until
+    none are left. Returns ``{status: count}``.
+    """
+    batch_size = batch_size or settings.PAYMENT_WEBHOOK_BATCH_SIZE
+    counts = {}
+    while True:
+        events = list(get_claimable().order_by("created", "id")[:batch_size])
+        if not events:
+            return counts
+        for status, count in process_events(events).items():
+            counts[status] = counts.get(status, 0) + count
+
+
+def replay_events(queryset):
+    """
+    Queue recorded events for processing again. Returns how many were
+    queued.
+    """
+    # Events being processed right now finish on their own
+    return queryset.exclude(status=WebhookEvent.Status.PROCESSING).update(
+        status=WebhookEvent.Status.PENDING, error=""
+    )
@@ -0,0 +1,149 @@
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from payment.stripe_client import REQUEST_DURATION, create_client
+
+
+class MockStripeHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request with a Checkout Session. New connections are
+    delayed by ``server.connect_delay`` to stand in for the TCP and TLS
+    handshake with the real API.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.server.connect_delay)
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.server.response_delay)
+        body = json.dumps(
+            {
+                "id": "cs_mock",
+                "object": "checkout.session",
+                "url": "https://checkout.stripe.com/mock",
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, connect_delay, response_delay):
+        super().__init__(("127.0.0.1", 0), MockStripeHandler)
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.connections = 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Checkout Session creation against a local mock Stripe "
+        "API: a new client per call against the shared pooled client."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--calls", type=int, default=200, help="Calls per scenario."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=8, help="Concurrent callers."
+        )
+        parser.add_argument(
+            "--connect-delay",
+            type=float,
+            default=60,
+            help="Simulated connection setup time in milliseconds.",
+        )
+        parser.add_argument(
+            "--response-delay",
+            type=float,
+            default=20,
+            help="Simulated API processing time in milliseconds.",
+        )
+
+    def handle(self, *args, **options):
+        server = MockStripeServer(
+            options["connect_delay"] / 1000, options["response_delay"] / 1000
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+        try:
+            with override_settings(
+                STRIPE_API_BASE=f"http://{host}:{port}",
+                STRIPE_SECRET_KEY="sk_test_mock",
+                STRIPE_MAX_NETWORK_RETRIES=0,
+            ):
+                pooled = create_client(pool_size=options["concurrency"])
+                self.run("new client per call", create_client, server, options)
+                self.run("shared pooled client", lambda: pooled, server, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        samples = sum(
+            sample.value
+            for metric in REQUEST_DURATION.collect()
+            for sample in metric.samples
+            if sample.name.endswith("_count")
+        )
+        self.stdout.write(
+            f"Histogram stripe_request_duration_seconds: {samples:.0f} observations."
+        )
+
+    def run(self, label, get_client, server, options):
+        params = {
+            "mode": "payment",
+            "success_url": "https://example.com/done",
+            "line_items": [
+                {
+                    "price_data": {
+                        "currency": "gbp",
+                        "product_data": {"name": "Bench"},
+                        "unit_amount": 999,
+                    },
+                    "quantity": 1,
+                }
+            ],
+        }
+
+        def call(_):
+            started = time.perf_counter()
+            get_client().v1.checkout.sessions.create(params=params)
+            return (time.perf_counter() - started) * 1000
+
+        connections = server.connections
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            timings = sorted(pool.map(call, range(options["calls"])))
+        elapsed = time.perf_counter() - started
+
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{label:>22}: mean {statistics.mean(timings):7.2f} ms  "
+            f"p50 {statistics.median(timings):7.2f} ms  p99 {p99:7.2f} ms  "
+            f"{len(timings) / elapsed:6.1f} calls/s  "
+            f"{server.connections - connections} connections"
+        )
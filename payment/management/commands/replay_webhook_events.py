@@ -0,0 +1,58 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.events import process_pending, replay_events
+from payment.models import WebhookEvent
+from payment.tasks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Process recorded Stripe webhook events again, selected by event id "
+        "or by status, type and date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_ids", nargs="*", help="Stripe event ids.")
+        parser.add_argument(
+            "--status",
+            choices=WebhookEvent.Status.values,
+            help="Only events with this status (default: failed, unless ids are given).",
+        )
+        parser.add_argument("--type", help="Only events of this type.")
+        parser.add_argument(
+            "--since",
+            type=datetime.date.fromisoformat,
+            help="Only events created on or after this date (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Queue the processing task instead of processing here.",
+        )
+
+    def handle(self, *args, **options):
+        events = WebhookEvent.objects.all()
+        if options["event_ids"]:
+            events = events.filter(event_id__in=options["event_ids"])
+        if options["status"] or not options["event_ids"]:
+            events = events.filter(
+                status=options["status"] or WebhookEvent.Status.FAILED
+            )
+        if options["type"]:
+            events = events.filter(type=options["type"])
+        if options["since"]:
+            events = events.filter(created__date__gte=options["since"])
+
+        count = replay_events(events)
+        if not count:
+            raise CommandError("No matching events.")
+        self.stdout.write(f"{count} events queued for processing.")
+
+        if options["background"]:
+            process_webhook_events.delay()
+            return
+        counts = process_pending()
+        summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(f"Processed: {summary or 'nothing'}."))
@@ -0,0 +1,298 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from celery.signals import after_task_publish
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from orders.invoices import delete_invoices
+from orders.models import Order
+from payment.events import process_pending
+from payment.models import WebhookEvent
+from payment.tasks import payment_completed
+
+
+def sign(payload, secret, timestamp):
+    """
+    Return a ``Stripe-Signature`` header value for ``payload``.
+    """
+    signed = f"{timestamp}.{payload}".encode()
+    digest = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def build_events(order, run_id, created):
+    """
+    Return the two events Stripe sends for a paid checkout of ``order``.
+    """
+    payment_intent = f"pi_load_{run_id}_{order.id}"
+    session = {
+        "id": f"cs_load_{run_id}_{order.id}",
+        "object": "checkout.session",
+        "payment_status": "paid",
+        "client_reference_id": str(order.id),
+        "metadata": {"order_id": str(order.id)},
+        "payment_intent": payment_intent,
+    }
+    intent = {
+        "id": payment_intent,
+        "object": "payment_intent",
+        "metadata": {"order_id": str(order.id)},
+    }
+    return [
+        {
+            "id": f"evt_load_{run_id}_{order.id}_{suffix}",
+            "object": "event",
+            "type": event_type,
+            "created": created + offset,
+            "data": {"object": obj},
+        }
+        for suffix, event_type, obj, offset in (
+            ("pi", "payment_intent.succeeded", intent, 0),
+            ("cs", "checkout.session.completed", session, 1),
+        )
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed unpaid orders and fire signed Stripe webhook events for them "
+        "at a running server, concurrently, with duplicate and out-of-order "
+        "deliveries. Reports acknowledgement latency, paid-flag update and "
+        "queueing times, and (with --process) the invoice jobs published."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://127.0.0.1:8000/payment/webhook/",
+            help="Webhook endpoint of the server under test.",
+        )
+        parser.add_argument(
+            "--orders", type=int, default=200, help="Number of orders to seed."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent senders."
+        )
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0.2,
+            help="Fraction of events delivered a second time.",
+        )
+        parser.add_argument(
+            "--in-order",
+            action="store_true",
+            help="Send events in creation order instead of shuffled.",
+        )
+        parser.add_argument(
+            "--process",
+            action="store_true",
+            help=(
+                "Process the recorded events in this command instead of "
+                "waiting for the Celery worker."
+            ),
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait for the worker to process the events.",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded orders and events instead of deleting them.",
+        )
+
+    def handle(self, *args, **options):
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError("STRIPE_WEBHOOK_SECRET is not set.")
+
+        run_id = uuid.uuid4().hex[:8]
+        orders = self.seed_orders(options["orders"], run_id)
+        self.stdout.write(f"Run {run_id}: seeded {len(orders)} orders.")
+
+        try:
+            created = int(time.time())
+            deliveries = [
+                event
+                for order in orders
+                for event in build_events(order, run_id, created)
+            ]
+            deliveries += random.sample(
+                deliveries, int(len(deliveries) * options["duplicates"])
+            )
+            if not options["in_order"]:
+                random.shuffle(deliveries)
+
+            latencies, statuses = self.fire(
+                deliveries, options["url"], secret, options["concurrency"]
+            )
+            self.report_requests(latencies, statuses)
+
+            events = WebhookEvent.objects.filter(
+                event_id__startswith=f"evt_load_{run_id}_"
+            )
+            published = None
+            if options["process"]:
+                published = self.process(orders)
+            else:
+                self.wait_for_worker(events, options["timeout"])
+            self.report_events(events, orders, published)
+        finally:
+            if not options["keep"]:
+                WebhookEvent.objects.filter(
+                    event_id__startswith=f"evt_load_{run_id}_"
+                ).delete()
+                Order.objects.filter(id__in=[order.id for order in orders]).delete()
+                for order in orders:
+                    delete_invoices(order.id)
+
+    def seed_orders(self, count, run_id):
+        # Marked as emailed so the dispatcher leaves the fake addresses alone
+        now = timezone.now()
+        return Order.objects.bulk_create(
+            Order(
+                first_name="Load",
+                last_name=run_id,
+                email=f"load-{run_id}-{i}@example.com",
+                address="1 Main St",
+                postal_code="10001",
+                city="New York",
+                confirmation_sent=now,
+                invoice_sent=now,
+            )
+            for i in range(count)
+        )
+
+    def fire(self, deliveries, url, secret, concurrency):
+        local = threading.local()
+
+        def send(event):
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            payload = json.dumps(event)
+            headers = {
+                "Content-Type": "application/json",
+                "Stripe-Signature": sign(payload, secret, int(time.time())),
+            }
+            started = time.perf_counter()
+            try:
+                response = local.session.post(
+                    url, data=payload, headers=headers, timeout=30
+                )
+                status = response.status_code
+            except requests.RequestException as exc:
+                status = type(exc).__name__
+            return (time.perf_counter() - started) * 1000, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, deliveries))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Sent {len(deliveries)} deliveries in {elapsed:.2f}s "
+            f"({len(deliveries) / elapsed:.1f}/s) with {concurrency} senders."
+        )
+        return [latency for latency, _ in results], Counter(
+            status for _, status in results
+        )
+
+    def process(self, orders):
+        """
+        Process the recorded events here, counting the payment_completed
+        jobs actually published per order.
+        """
+        published = Counter()
+
+        def count(sender=None, headers=None, **kwargs):
+            if sender == payment_completed.name:
+                published[headers.get("argsrepr")] += 1
+
+        after_task_publish.connect(count, weak=False)
+        try:
+            process_pending()
+        finally:
+            after_task_publish.disconnect(count)
+        return published
+
+    def wait_for_worker(self, events, timeout):
+        deadline = time.monotonic() + timeout
+        while events.filter(status=WebhookEvent.Status.PENDING).exists():
+            if time.monotonic() > deadline:
+                self.stderr.write("Timed out waiting for the worker.")
+                return
+            time.sleep(0.5)
+
+    def report_requests(self, latencies, statuses):
+        self.stdout.write(
+            f"Acknowledgement latency: p50 {percentile(latencies, 0.50):.1f} ms  "
+            f"p99 {percentile(latencies, 0.99):.1f} ms  "
+            f"max {max(latencies, default=0):.1f} ms"
+        )
+        self.stdout.write(
+            "Responses: "
+            + ", ".join(f"{status}: {n}" for status, n in sorted(statuses.items()))
+        )
+
+    def report_events(self, events, orders, published):
+        statuses = Counter(events.values_list("status", flat=True))
+        update_times = list(
+            events.exclude(lock_wait_ms=None).values_list("lock_wait_ms", flat=True)
+        )
+        queue_delays = [
+            (processed - received).total_seconds() * 1000
+            for received, processed in events.exclude(processed=None).values_list(
+                "received", "processed"
+            )
+        ]
+        paid = Order.objects.filter(
+            id__in=[order.id for order in orders], paid=True
+        ).count()
+        self.stdout.write(
+            f"Events recorded: {sum(statuses.values())} "
+            f"({', '.join(f'{n} {s}' for s, n in sorted(statuses.items()))})"
+        )
+        # The conditional UPDATE includes any wait for the order's row lock
+        self.stdout.write(
+            f"Paid-flag update: p50 {percentile(update_times, 0.50):.1f} ms  "
+            f"p99 {percentile(update_times, 0.99):.1f} ms"
+        )
+        self.stdout.write(
+            f"Received to processed: p50 {percentile(queue_delays, 0.50):.1f} ms  "
+            f"p99 {percentile(queue_delays, 0.99):.1f} ms"
+        )
+        if published is None:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{paid}/{len(orders)} orders paid; invoice jobs are "
+                    "published by the worker (use --process to count them)."
+                )
+            )
+            return
+        duplicates = sum(1 for n in published.values() if n > 1)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{paid}/{len(orders)} orders paid; "
+                f"{sum(published.values())} invoice jobs published for "
+                f"{len(published)} orders ({duplicates} orders more than once)."
+            )
+        )
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="WebhookEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event_id",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="event id"
+                    ),
+                ),
+                ("type", models.CharField(max_length=100, verbose_name="type")),
+                ("created", models.DateTimeField(verbose_name="created")),
+                ("payload", models.JSONField(verbose_name="payload")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "pending"),
+                            ("processed", "processed"),
+                            ("skipped", "skipped"),
+                            ("failed", "failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="status",
+                    ),
+                ),
+                (
+                    "order_id",
+                    models.PositiveBigIntegerField(
+                        blank=True, null=True, verbose_name="order id"
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="attempts"),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="error")),
+                (
+                    "lock_wait_ms",
+                    models.FloatField(
+                        blank=True, null=True, verbose_name="lock wait (ms)"
+                    ),
+                ),
+                (
+                    "received",
+                    models.DateTimeField(auto_now_add=True, verbose_name="received"),
+                ),
+                (
+                    "processed",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="processed"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created"],
+                        name="payment_web_status_78723d_idx",
+                    )
+                ],
+            },
+        ),
+    ]
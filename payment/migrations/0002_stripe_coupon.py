@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coupons", "0001_initial"),
+        ("payment", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeCoupon",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("discount", models.IntegerField(verbose_name="discount")),
+                (
+                    "stripe_id",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Stripe coupon id"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created"),
+                ),
+                (
+                    "coupon",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stripe_coupons",
+                        to="coupons.coupon",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("coupon", "discount"),
+                        name="stripe_coupon_unique_discount",
+                    )
+                ],
+            },
+        ),
+    ]
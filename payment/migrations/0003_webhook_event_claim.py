@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payment", "0002_stripe_coupon"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="webhookevent",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="claimed"),
+        ),
+        migrations.AlterField(
+            model_name="webhookevent",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("processing", "processing"),
+                    ("processed", "processed"),
+                    ("skipped", "skipped"),
+                    ("failed", "failed"),
+                ],
+                default="pending",
+                max_length=10,
+                verbose_name="status",
+            ),
+        ),
+    ]
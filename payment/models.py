@@ -1,3 +1,68 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """
+    A verified Stripe event, recorded once per Stripe event id and
+    processed in the background.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", _("pending")
+        PROCESSING = "processing", _("processing")
+        PROCESSED = "processed", _("processed")
+        SKIPPED = "skipped", _("skipped")
+        FAILED = "failed", _("failed")
+
+    event_id = models.CharField(_("event id"), max_length=255, unique=True)
+    type = models.CharField(_("type"), max_length=100)
+    # When Stripe created the event; events are processed in this order
+    created = models.DateTimeField(_("created"))
+    payload = models.JSONField(_("payload"))
+    status = models.CharField(
+        _("status"), max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    order_id = models.PositiveBigIntegerField(_("order id"), null=True, blank=True)
+    attempts = models.PositiveIntegerField(_("attempts"), default=0)
+    error = models.TextField(_("error"), blank=True)
+    # Duration of the paid-flag UPDATE on the last attempt, including any
+    # wait for the order row lock (or SQLite's write lock)
+    lock_wait_ms = models.FloatField(_("lock wait (ms)"), null=True, blank=True)
+    # When a worker claimed the event; stale claims are taken over
+    claimed = models.DateTimeField(_("claimed"), null=True, blank=True)
+    received = models.DateTimeField(_("received"), auto_now_add=True)
+    processed = models.DateTimeField(_("processed"), null=True, blank=True)
+
+    class Meta:
+        ordering = ["created", "id"]
+        indexes = [
+            models.Index(fields=["status", "created"]),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
+
+class StripeCoupon(models.Model):
+    """
+    The Stripe coupon created for a shop coupon at a given discount, reused
+    by every checkout that applies it.
+    """
+
+    coupon = models.ForeignKey(
+        "coupons.Coupon", related_name="stripe_coupons", on_delete=models.CASCADE
+    )
+    discount = models.IntegerField(_("discount"))
+    stripe_id = models.CharField(_("Stripe coupon id"), max_length=255, unique=True)
+    created = models.DateTimeField(_("created"), auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["coupon", "discount"], name="stripe_coupon_unique_discount"
+            ),
+        ]
+
+    def __str__(self):
+        return self.stripe_id
@@ -0,0 +1,96 @@
+"""
+Process-wide Stripe client.
+
+All Stripe API calls go through one :class:`stripe.StripeClient` whose HTTP
+client keeps a pool of keep-alive connections, uses bounded connect/read
+timeouts and times every request into a Prometheus histogram. Retries of
+failed requests (with idempotency keys) are left to Stripe's own retry
+policy.
+"""
+
+import re
+import threading
+import time
+
+import requests
+import stripe
+from django.conf import settings
+from prometheus_client import Histogram
+from requests.adapters import HTTPAdapter
+
+REQUEST_DURATION = Histogram(
+    "stripe_request_duration_seconds",
+    "Duration of Stripe API requests, one observation per attempt.",
+    ["method", "endpoint", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2.5, 5, 10, 30),
+)
+
+# Path segments holding object ids are collapsed to keep label cardinality low
+ID_SEGMENT = re.compile(r"^(?!v\d+$).*\d")
+
+
+def get_endpoint(url):
+    path = url.split("://", 1)[-1].split("?", 1)[0]
+    segments = path.split("/")[1:]
+    return "/" + "/".join("{id}" if ID_SEGMENT.match(s) else s for s in segments)
+
+
+class TimedRequestsClient(stripe.RequestsClient):
+    """
+    Requests-based HTTP client that records the duration of each request.
+    """
+
+    def request(self, method, url, headers, post_data=None):
+        started = time.perf_counter()
+        status = "error"
+        try:
+            content, status_code, response_headers = super().request(
+                method, url, headers, post_data
+            )
+            status = str(status_code)
+            return content, status_code, response_headers
+        finally:
+            REQUEST_DURATION.labels(method.upper(), get_endpoint(url), status).observe(
+                time.perf_counter() - started
+            )
+
+
+def create_client(pool_size=None):
+    """
+    Return a new Stripe client with its own connection pool.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size or settings.STRIPE_POOL_SIZE
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    http_client = TimedRequestsClient(
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        session=session,
+    )
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        stripe_version=settings.STRIPE_API_VERSION,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+        http_client=http_client,
+        base_addresses=(
+            {"api": settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None
+        ),
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_stripe():
+    """
+    Return the process-wide Stripe client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_client()
+    return _client
@@ -1,82 +1,58 @@
 import logging
-from io import BytesIO
 
-import weasyprint
 from celery import shared_task
-from django.conf import settings
-from django.contrib.staticfiles import finders
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.db import DatabaseError
 
+from orders.emails import dispatch_pending
+from orders.invoices import get_invoice
 from orders.models import Order  # ✅ correct import
+from orders.tasks import EMAIL_TASK_OPTIONS
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(
-    bind=True,
-    autoretry_for=(Exception,),
-    retry_kwargs={"max_retries": 3, "countdown": 60},
-)
-def payment_completed(self, order_id: int) -> int:
+@shared_task(**EMAIL_TASK_OPTIONS)
+def payment_completed(order_id: int) -> dict:
     """
-    Send invoice email with attached PDF after successful payment.
-    Returns 1 if email sent, 0 if skipped.
+    Send the invoice email with the attached PDF after a successful
+    payment, batched with any other pending emails.
     """
     try:
         order = Order.objects.get(id=order_id)
     except Order.DoesNotExist:
         logger.warning("payment_completed: Order %s not found", order_id)
-        return 0
-
-    order.refresh_from_db()
+        return {}
 
     if not order.paid:
         logger.info("payment_completed: Order %s not paid; skipping invoice", order.id)
-        return 0
-
-    subject = f"Su Solutions Shop – Invoice no. {order.id}"
-    message = "Please find attached the invoice for your recent purchase."
-
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[order.email],
-    )
-
-    # Render invoice HTML (NO logo context)
-    html = render_to_string("orders/order/pdf.html", {"order": order})
+        return {}
 
-    out = BytesIO()
+    # Render the invoice up front so the batch only reads stored files;
+    # nothing to do if it already went out
+    if order.invoice_sent is None:
+        get_invoice(order)
 
-    css_path = finders.find("css/pdf.css")
-    stylesheets = [weasyprint.CSS(css_path)] if css_path else []
+    totals = dispatch_pending()
+    logger.info("payment_completed: order_id=%s sent=%s", order.id, totals)
+    return totals
 
-    if not css_path:
-        logger.warning(
-            "payment_completed: css/pdf.css not found; generating PDF without CSS"
-        )
 
-    # base_url helps WeasyPrint resolve relative paths
-    weasyprint.HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(
-        out, stylesheets=stylesheets
-    )
-
-    pdf_bytes = out.getvalue()
-    if not pdf_bytes:
-        raise RuntimeError(
-            f"payment_completed: Generated PDF is empty for order {order.id}"
-        )
-
-    email.attach(f"order_{order.id}.pdf", pdf_bytes, "application/pdf")
-    sent = email.send(fail_silently=False)
+@shared_task(
+    autoretry_for=(DatabaseError,),
+    retry_backoff=5,
+    retry_kwargs={"max_retries": 5},
+)
+def process_webhook_events() -> dict:
+    """
+    Apply the pending Stripe events recorded by the webhook, in the order
+    Stripe created them. Also runs periodically (CELERY_BEAT_SCHEDULE) to
+    pick up events whose task was never published. Returns
+    ``{status: count}``.
+    """
+    # payment.events enqueues payment_completed from this module
+    from .events import process_pending
 
-    logger.info(
-        "payment_completed: sent=%s order_id=%s to=%s pdf_bytes=%s",
-        sent,
-        order.id,
-        order.email,
-        len(pdf_bytes),
-    )
-    return 1 if sent else 0
+    counts = process_pending()
+    if counts:
+        logger.info("process_webhook_events: %s", counts)
+    return counts
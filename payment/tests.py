@@ -1,3 +1,66 @@
+import datetime
+
 from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Order
+
+from .events import CLAIM_TIMEOUT, process_pending, record_event
+from .models import WebhookEvent
+
+
+def make_event(event_id, order_id):
+    return {
+        "id": event_id,
+        "type": "payment_intent.succeeded",
+        "created": 1700000000,
+        "data": {"object": {"id": "pi_1", "metadata": {"order_id": str(order_id)}}},
+    }
+
+
+class WebhookEventTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(
+            first_name="Ana",
+            last_name="Diaz",
+            email="ana@example.com",
+            address="1 Main St",
+            postal_code="10001",
+            city="New York",
+        )
+
+    def test_duplicate_event_id_is_recorded_once(self):
+        event = make_event("evt_1", self.order.id)
+        recorded, created = record_event(event, event)
+        duplicate, duplicate_created = record_event(event, event)
+
+        self.assertTrue(created)
+        self.assertFalse(duplicate_created)
+        self.assertEqual(duplicate.pk, recorded.pk)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_stale_processing_claim_is_taken_over(self):
+        event = make_event("evt_1", self.order.id)
+        recorded, _ = record_event(event, event)
+        WebhookEvent.objects.filter(pk=recorded.pk).update(
+            status=WebhookEvent.Status.PROCESSING,
+            claimed=timezone.now() - CLAIM_TIMEOUT - datetime.timedelta(minutes=1),
+        )
+
+        counts = process_pending()
+
+        self.assertEqual(counts, {WebhookEvent.Status.PROCESSED: 1})
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.paid)
+        self.assertEqual(self.order.stripe_id, "pi_1")
+
+    def test_live_processing_claim_is_left_alone(self):
+        event = make_event("evt_1", self.order.id)
+        recorded, _ = record_event(event, event)
+        WebhookEvent.objects.filter(pk=recorded.pk).update(
+            status=WebhookEvent.Status.PROCESSING, claimed=timezone.now()
+        )
 
-# Create your tests here.
+        self.assertEqual(process_pending(), {})
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.paid)
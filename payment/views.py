@@ -1,14 +1,24 @@
 from decimal import Decimal, ROUND_HALF_UP
 
-import stripe
+import os
+
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
 
 from orders.models import Order
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-stripe.api_version = settings.STRIPE_API_VERSION
+from .coupons import get_stripe_coupon_id
+from .stripe_client import get_stripe
 
 
 def _to_pence(amount: Decimal) -> int:
@@ -21,7 +31,7 @@ def payment_process(request):
     if not order_id:
         return redirect("cart:cart_detail")  # adjust if your cart url name differs
 
-    order = get_object_or_404(Order, id=order_id)
+    order = get_object_or_404(Order.objects.select_related("coupon"), id=order_id)
 
     if request.method == "POST":
         # ✅ include session_id for Stripe verification on completed page
@@ -55,16 +65,13 @@ def payment_process(request):
                 }
             )
 
-        # Stripe coupon (see note below)
-        if getattr(order, "coupon", None):
-            stripe_coupon = stripe.Coupon.create(
-                name=order.coupon.code,
-                percent_off=order.discount,  # make sure this is a number 0-100
-                duration="once",
-            )
-            session_data["discounts"] = [{"coupon": stripe_coupon.id}]
+        # Stripe coupon, created in Stripe the first time it is used only
+        if order.coupon:
+            session_data["discounts"] = [
+                {"coupon": get_stripe_coupon_id(order.coupon, order.discount)}
+            ]
 
-        session = stripe.checkout.Session.create(**session_data)
+        session = get_stripe().v1.checkout.sessions.create(params=session_data)
         return redirect(session.url, code=303)
 
     return render(request, "payment/process.html", {"order": order})
@@ -77,3 +84,20 @@ def payment_completed(request):
 
 def payment_cancelled(request):
     return render(request, "payment/cancelled.html")
+
+
+def metrics(request):
+    """
+    Prometheus metrics of this process (or of all workers, in
+    multiprocess mode), for scrapers presenting METRICS_TOKEN.
+    """
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        token, settings.METRICS_TOKEN
+    ):
+        return HttpResponseForbidden()
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
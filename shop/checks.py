@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Product listing and coupon caches are invalidated by signals in the
+    process that saved the model; other workers only see the invalidation
+    through a shared cache.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if settings.DEBUG or backend != LOCMEM_BACKEND:
+        return []
+    return [
+        Warning(
+            f"The default cache ({backend}) is private to each process.",
+            hint=(
+                "Product listings and coupons are invalidated only in the "
+                "process that saves them; other workers serve stale entries "
+                "until they expire. Use a shared backend such as RedisCache."
+            ),
+            id="shop.W001",
+        )
+    ]
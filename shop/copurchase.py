@@ -0,0 +1,273 @@
+"""
+Offline "bought together" engine.
+
+Builds a sparse product x product co-occurrence matrix from order items
+with NumPy, keeps the top-N neighbours of every product and stores them as
+a compact CSR-style ``.npz`` artifact. The recommender reads the artifact
+when Redis is unavailable.
+"""
+
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+
+def order_pairs(order_ids, product_ids):
+    """
+    Return ``(rows, cols)`` arrays with every ordered pair of distinct
+    products bought in the same order. Both inputs must be sorted by order.
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if order_ids.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Drop repeated products within an order
+    keep = np.ones(order_ids.size, dtype=bool)
+    order = np.lexsort((product_ids, order_ids))
+    order_ids, product_ids = order_ids[order], product_ids[order]
+    keep[1:] = (order_ids[1:] != order_ids[:-1]) | (product_ids[1:] != product_ids[:-1])
+    order_ids, product_ids = order_ids[keep], product_ids[keep]
+
+    # Every item is paired with each item of its own order
+    starts = np.flatnonzero(np.r_[True, order_ids[1:] != order_ids[:-1]])
+    sizes = np.diff(np.r_[starts, order_ids.size])
+    item_sizes = np.repeat(sizes, sizes)
+    item_starts = np.repeat(starts, sizes)
+
+    left = np.repeat(np.arange(order_ids.size), item_sizes)
+    first = np.cumsum(item_sizes) - item_sizes
+    right = np.repeat(item_starts, item_sizes) + (
+        np.arange(left.size) - np.repeat(first, item_sizes)
+    )
+    distinct = left != right
+    return product_ids[left[distinct]], product_ids[right[distinct]]
+
+
+class CoOccurrenceCounter:
+    """
+    Accumulate pair counts as sorted ``(key, count)`` arrays where
+    ``key = row * stride + col``.
+    """
+
+    def __init__(self, stride, compact_every=5_000_000):
+        self.stride = stride
+        self.compact_every = compact_every
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, rows, cols):
+        if rows.size == 0:
+            return
+        keys, counts = np.unique(rows * self.stride + cols, return_counts=True)
+        self._pending.append((keys, counts))
+        self._pending_size += keys.size
+        if self._pending_size >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return
+        keys = np.concatenate([self.keys] + [k for k, _ in self._pending])
+        counts = np.concatenate([self.counts] + [c for _, c in self._pending])
+        self._pending = []
+        self._pending_size = 0
+
+        order = np.argsort(keys, kind="stable")
+        keys, counts = keys[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.keys = keys[starts]
+        self.counts = np.add.reduceat(counts, starts)
+
+    def top_n(self, n):
+        """
+        Return a :class:`CoPurchaseIndex` with the ``n`` most frequent
+        neighbours of every product.
+        """
+        self.compact()
+        rows = self.keys // self.stride
+        cols = self.keys % self.stride
+        counts = self.counts
+
+        # Rank neighbours per row: highest count first, lowest id on ties
+        order = np.lexsort((cols, -counts, rows))
+        rows, cols, counts = rows[order], cols[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        sizes = np.diff(np.r_[starts, rows.size])
+        rank = np.arange(rows.size) - np.repeat(starts, sizes)
+        keep = rank < n
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+
+        product_ids, row_sizes = np.unique(rows, return_counts=True)
+        indptr = np.zeros(product_ids.size + 1, dtype=np.int64)
+        np.cumsum(row_sizes, out=indptr[1:])
+        return CoPurchaseIndex(product_ids, indptr, cols, counts)
+
+
+class CoPurchaseIndex:
+    """
+    Top-N neighbours per product in CSR layout: the neighbours of
+    ``product_ids[i]`` are ``neighbours[indptr[i]:indptr[i + 1]]``.
+    """
+
+    def __init__(self, product_ids, indptr, neighbours, scores):
+        self.product_ids = np.asarray(product_ids, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.neighbours = np.asarray(neighbours, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float32)
+
+    def __len__(self):
+        return self.product_ids.size
+
+    def neighbours_of(self, product_id):
+        i = np.searchsorted(self.product_ids, product_id)
+        if i >= self.product_ids.size or self.product_ids[i] != product_id:
+            return self.neighbours[:0], self.scores[:0]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.neighbours[start:end], self.scores[start:end]
+
+    def suggest(self, product_ids, max_results=6):
+        """
+        Return up to ``max_results`` product ids most often bought with
+        ``product_ids``, summing scores across the given products.
+        """
+        scores = {}
+        for product_id in product_ids:
+            neighbours, neighbour_scores = self.neighbours_of(product_id)
+            for neighbour, score in zip(neighbours.tolist(), neighbour_scores.tolist()):
+                scores[neighbour] = scores.get(neighbour, 0.0) + score
+        for product_id in product_ids:
+            scores.pop(product_id, None)
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+        return ranked[:max_results]
+
+    def save(self, path):
+        """
+        Write the index as a compressed ``.npz`` file, atomically.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        id_dtype = np.int32 if self.product_ids.max(initial=0) < 2**31 else np.int64
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez_compressed(
+                    fh,
+                    product_ids=self.product_ids.astype(id_dtype),
+                    indptr=self.indptr,
+                    neighbours=self.neighbours.astype(id_dtype),
+                    scores=self.scores,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["product_ids"],
+                data["indptr"],
+                data["neighbours"],
+                data["scores"],
+            )
+
+
+def build_index(rows_iter, stride, top_n=20, chunk_size=100_000):
+    """
+    Build a :class:`CoPurchaseIndex` from an iterable of
+    ``(order_id, product_id)`` tuples sorted by order id. Rows are
+    processed in vectorized chunks that never split an order.
+    """
+    counter = CoOccurrenceCounter(stride)
+    buffer = []
+    for row in rows_iter:
+        buffer.append(row)
+        if len(buffer) >= max(chunk_size, 2) and buffer[-1][0] != buffer[-2][0]:
+            # The last row starts a new order; carry it to the next chunk
+            carry = buffer.pop()
+            counter.add(*order_pairs(*np.array(buffer, dtype=np.int64).T))
+            buffer = [carry]
+    if buffer:
+        counter.add(*order_pairs(*np.array(buffer, dtype=np.int64).T))
+    return counter.top_n(top_n)
+
+
+def iter_paid_order_items(orders_per_query=2000):
+    """
+    Yield ``(order_id, product_id)`` for the items of paid orders, sorted by
+    order id. Orders are read ``orders_per_query`` at a time with keyset
+    queries that are fully fetched, so no cursor stays open between chunks
+    (an open read cursor blocks every writer on SQLite) and no order is
+    split across chunks.
+    """
+    from orders.models import Order, OrderItem
+
+    last_id = 0
+    while True:
+        order_ids = list(
+            Order.objects.filter(paid=True, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:orders_per_query]
+        )
+        if not order_ids:
+            return
+        yield from list(
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .order_by("order_id")
+            .values_list("order_id", "product_id")
+        )
+        last_id = order_ids[-1]
+
+
+def build_index_from_orders(top_n=20, chunk_size=100_000):
+    """
+    Build the index from the items of paid orders.
+    """
+    from django.db.models import Max
+
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(order__paid=True)
+    max_id = items.aggregate(max_id=Max("product_id"))["max_id"] or 0
+    # The chunks are separate queries, not one snapshot; products created
+    # after the build started don't fit the stride and wait for the next one
+    rows = (row for row in iter_paid_order_items() if row[1] <= max_id)
+    return build_index(
+        rows,
+        stride=max_id + 1,
+        top_n=top_n,
+        chunk_size=chunk_size,
+    )
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Return the on-disk index, reloading it when the file changes, or
+    ``None`` if no index has been built.
+    """
+    global _index, _index_mtime
+    path = settings.RECOMMENDER_INDEX_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    if _index is None or mtime != _index_mtime:
+        with _index_lock:
+            if _index is None or mtime != _index_mtime:
+                _index = CoPurchaseIndex.load(path)
+                _index_mtime = mtime
+    return _index
@@ -0,0 +1,132 @@
+"""
+Cache of the rendered product listing, per language and category slug.
+
+Each cached entry is addressed through two version tokens: one for the
+whole catalog (bumped when categories change, since every page renders the
+category sidebar) and one for the (language, category) listing itself
+(bumped when a product in it changes). Invalidating means dropping a token;
+the next read issues a fresh one and old entries are never reached again.
+"""
+
+import base64
+import binascii
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+CATALOG_VERSION_KEY = "shop:product_list:catalog_version"
+
+
+def listing_version_key(language_code, category_slug=None):
+    return f"shop:product_list:version:{language_code}:{category_slug or ''}"
+
+
+def listing_cache_key(language_code, category_slug=None, cursor=None):
+    """
+    Return the key under which the listing page is currently cached.
+    """
+    version_key = listing_version_key(language_code, category_slug)
+    versions = cache.get_many([CATALOG_VERSION_KEY, version_key])
+    for key in (CATALOG_VERSION_KEY, version_key):
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return (
+        f"shop:product_list:{language_code}:{category_slug or ''}:"
+        f"{versions[CATALOG_VERSION_KEY]}:{versions[version_key]}:{cursor or ''}"
+    )
+
+
+def get_listing(language_code, category_slug=None, cursor=None):
+    return cache.get(listing_cache_key(language_code, category_slug, cursor))
+
+
+def set_listing(language_code, category_slug, cursor, listing):
+    cache.set(
+        listing_cache_key(language_code, category_slug, cursor),
+        listing,
+        settings.PRODUCT_LIST_CACHE_TIMEOUT,
+    )
+
+
+def encode_position(position):
+    created, pk = position
+    value = f"{created.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+
+def encode_cursor(product):
+    return encode_position((product.created, product.pk))
+
+
+def decode_cursor(cursor):
+    """
+    Return the ``(created, id)`` position encoded in ``cursor``, or
+    ``None`` if it is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        value = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created, pk = value.decode().split("|")
+        return datetime.fromisoformat(created), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def is_product_position(position):
+    """
+    Return whether ``position`` is that of an existing product, i.e. one
+    :func:`paginate` could have handed out as a cursor.
+    """
+    from .models import Product
+
+    created, pk = position
+    return Product.objects.filter(pk=pk, created=created).exists()
+
+
+def paginate(products, position=None, page_size=None):
+    """
+    Return one page of ``products`` in ``-created, -id`` order starting
+    after ``position``, and the cursor of the next page (``None`` on the
+    last page). Each page is a single range scan on the ``-created``
+    index, whatever its depth.
+    """
+    page_size = page_size or settings.PRODUCT_LIST_PAGE_SIZE
+    products = products.order_by("-created", "-id")
+    if position is not None:
+        created, pk = position
+        products = products.filter(
+            Q(created__lt=created) | Q(created=created, id__lt=pk)
+        )
+    page = list(products[: page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+def invalidate_catalog():
+    """
+    Drop every cached listing, e.g. after a category was renamed.
+    """
+    cache.delete(CATALOG_VERSION_KEY)
+
+
+def invalidate_categories(category_ids):
+    """
+    Drop the cached "all products" listings and the listings of the given
+    categories, in every language.
+    """
+    from .models import Category
+
+    translation_model = Category._parler_meta.root_model
+    slugs = translation_model.objects.filter(master_id__in=category_ids).values_list(
+        "language_code", "slug"
+    )
+    keys = [listing_version_key(code) for code, _ in settings.LANGUAGES]
+    keys += [listing_version_key(code, slug) for code, slug in slugs]
+    cache.delete_many(keys)
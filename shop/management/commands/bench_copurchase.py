@@ -0,0 +1,96 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from shop.copurchase import CoPurchaseIndex, build_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the offline co-purchase engine on synthetic orders: "
+        "build time, artifact size and lookup latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000],
+            help="Catalog sizes to benchmark.",
+        )
+        parser.add_argument(
+            "--orders-per-product",
+            type=int,
+            default=5,
+            help="Synthetic orders generated per catalog product.",
+        )
+        parser.add_argument(
+            "--max-items",
+            type=int,
+            default=8,
+            help="Maximum number of distinct products per order.",
+        )
+        parser.add_argument("--top-n", type=int, default=20)
+        parser.add_argument("--lookups", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        for products in options["products"]:
+            self.run(rng, products, options)
+
+    def synthetic_rows(self, rng, products, orders, max_items):
+        # Zipf-like popularity so some products have many neighbours
+        sizes = rng.integers(1, max_items + 1, size=orders)
+        order_ids = np.repeat(np.arange(orders), sizes)
+        weights = 1.0 / np.arange(1, products + 1)
+        weights /= weights.sum()
+        product_ids = rng.choice(products, size=order_ids.size, p=weights) + 1
+        return order_ids, product_ids
+
+    def run(self, rng, products, options):
+        orders = products * options["orders_per_product"]
+        order_ids, product_ids = self.synthetic_rows(
+            rng, products, orders, options["max_items"]
+        )
+        rows = zip(order_ids.tolist(), product_ids.tolist())
+
+        started = time.perf_counter()
+        index = build_index(rows, stride=products + 1, top_n=options["top_n"])
+        build_time = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "copurchase.npz"
+            started = time.perf_counter()
+            index.save(path)
+            save_time = time.perf_counter() - started
+            size = path.stat().st_size
+            started = time.perf_counter()
+            index = CoPurchaseIndex.load(path)
+            load_time = time.perf_counter() - started
+
+        lookups = options["lookups"]
+        single = rng.integers(1, products + 1, size=lookups).tolist()
+        started = time.perf_counter()
+        for product_id in single:
+            index.suggest([product_id], 4)
+        single_us = (time.perf_counter() - started) / lookups * 1e6
+
+        carts = rng.integers(1, products + 1, size=(lookups, 5)).tolist()
+        started = time.perf_counter()
+        for cart in carts:
+            index.suggest(cart, 4)
+        cart_us = (time.perf_counter() - started) / lookups * 1e6
+
+        self.stdout.write(
+            f"{products} products, {orders} orders, {order_ids.size} items:\n"
+            f"  build      {build_time:8.2f} s\n"
+            f"  save/load  {save_time:8.2f} s / {load_time:.2f} s "
+            f"({size / 1024:.0f} KiB)\n"
+            f"  lookup     {single_us:8.1f} us (1 product), "
+            f"{cart_us:.1f} us (5-product cart)"
+        )
@@ -0,0 +1,145 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import translation
+
+from shop.models import Category, Product
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def check_cart(cart, add_urls):
+    # An invalid add form redirects without adding anything, which would
+    # quietly benchmark an empty cart
+    lines = len(cart or {})
+    if lines != len(add_urls):
+        raise CommandError(f"The cart has {lines} lines after {len(add_urls)} adds.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the product detail and cart pages served "
+        "through the WSGI handler (one thread per concurrent request) and the "
+        "ASGI handler (one event loop). The products are created for the run "
+        "and deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per scenario."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Concurrent clients."
+        )
+        parser.add_argument(
+            "--cart-lines",
+            type=int,
+            default=5,
+            help="Distinct products in the benchmarked cart.",
+        )
+
+    def handle(self, *args, **options):
+        translation.activate(settings.LANGUAGE_CODE)
+        category, products = self.create_products(max(options["cart_lines"], 1))
+        try:
+            # URLs are resolved here, where the language is active
+            add_urls = [
+                reverse("cart:cart_add", args=[product.id])
+                for product in products[: options["cart_lines"]]
+            ]
+            pages = {
+                "product detail": (products[0].get_absolute_url(), []),
+                "cart": (reverse("cart:cart_detail"), add_urls),
+            }
+            for label, (url, cart_urls) in pages.items():
+                self.run(f"WSGI {label}", self.run_wsgi, url, cart_urls, options)
+                self.run(f"ASGI {label}", self.run_asgi, url, cart_urls, options)
+        finally:
+            # Deleting the category cascades to its products
+            category.delete()
+
+    def create_products(self, count):
+        category = Category()
+        category.set_current_language(settings.LANGUAGE_CODE)
+        category.name = category.slug = "bench-views"
+        category.save()
+        products = []
+        for i in range(count):
+            product = Product(category=category, price=Decimal("9.99"))
+            product.set_current_language(settings.LANGUAGE_CODE)
+            product.name = product.slug = f"bench-views-{i}"
+            product.save()
+            products.append(product)
+        return category, products
+
+    def run(self, label, runner, url, add_urls, options):
+        started = time.perf_counter()
+        results = runner(url, add_urls, options)
+        elapsed = time.perf_counter() - started
+
+        timings = sorted(timing for timing, _ in results)
+        failures = sum(1 for _, status in results if status != 200)
+        self.stdout.write(
+            f"{label:>20}: {len(timings) / elapsed:7.1f} req/s  "
+            f"p50 {statistics.median(timings):7.2f} ms  "
+            f"p99 {percentile(timings, 0.99):7.2f} ms"
+            + (f"  {failures} failed" if failures else "")
+        )
+
+    def run_wsgi(self, url, add_urls, options):
+        local = threading.local()
+
+        def fetch(_):
+            if not hasattr(local, "client"):
+                local.client = Client()
+                for add_url in add_urls:
+                    local.client.post(add_url, {"quantity": 1})
+                check_cart(local.client.session.get(settings.CART_SESSION_ID), add_urls)
+                # Warm up before timing
+                local.client.get(url)
+            started = time.perf_counter()
+            response = local.client.get(url)
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            return list(pool.map(fetch, range(options["requests"])))
+
+    def run_asgi(self, url, add_urls, options):
+        async def worker(client, count):
+            for add_url in add_urls:
+                await client.post(add_url, {"quantity": 1})
+            session = await client.asession()
+            check_cart(await session.aget(settings.CART_SESSION_ID), add_urls)
+            await client.get(url)
+            results = []
+            for _ in range(count):
+                started = time.perf_counter()
+                response = await client.get(url)
+                results.append(
+                    ((time.perf_counter() - started) * 1000, response.status_code)
+                )
+            return results
+
+        async def main():
+            concurrency = options["concurrency"]
+            counts = [
+                options["requests"] // concurrency
+                + (i < options["requests"] % concurrency)
+                for i in range(concurrency)
+            ]
+            results = await asyncio.gather(
+                *(worker(AsyncClient(), count) for count in counts)
+            )
+            return [result for worker_results in results for result in worker_results]
+
+        return asyncio.run(main())
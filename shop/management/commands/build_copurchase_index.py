@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.copurchase import build_index_from_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the offline co-purchase index served by the recommender "
+        "when Redis is unavailable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-n",
+            type=int,
+            default=20,
+            help="Number of neighbours kept per product.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100_000,
+            help="Number of order item rows processed per vectorized batch.",
+        )
+        parser.add_argument(
+            "--output",
+            default=settings.RECOMMENDER_INDEX_PATH,
+            help="Path of the .npz artifact (default: RECOMMENDER_INDEX_PATH).",
+        )
+
+    def handle(self, *args, **options):
+        if options["top_n"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("--top-n and --chunk-size must be positive.")
+
+        started = time.perf_counter()
+        index = build_index_from_orders(
+            top_n=options["top_n"], chunk_size=options["chunk_size"]
+        )
+        index.save(options["output"])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote neighbours for {len(index)} products "
+                f"({index.neighbours.size} entries) to {options['output']} "
+                f"in {elapsed:.2f}s."
+            )
+        )
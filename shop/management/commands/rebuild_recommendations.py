@@ -0,0 +1,95 @@
+import time
+from collections import Counter
+from itertools import groupby, permutations
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+
+from shop.copurchase import iter_paid_order_items
+from shop.recommender import Recommender
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the 'bought together' keyspace in Redis from the items "
+        "of paid orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Number of orders aggregated before flushing to Redis.",
+        )
+        parser.add_argument(
+            "--no-clear",
+            action="store_true",
+            help=(
+                "Add to the counts of the live generation instead of "
+                "building a new one."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+
+        recommender = Recommender()
+        started = time.perf_counter()
+
+        try:
+            if options["no_clear"]:
+                generation = None
+            else:
+                generation = recommender.start_rebuild()
+                self.stdout.write(f"Building generation {generation}...")
+        except RedisError as exc:
+            raise CommandError(f"Redis unavailable: {exc}") from exc
+
+        try:
+            rows = iter_paid_order_items(chunk_size)
+
+            pair_counts = Counter()
+            orders = 0
+            pairs = 0
+            for _, items in groupby(rows, key=itemgetter(0)):
+                product_ids = {product_id for _, product_id in items}
+                orders += 1
+                for pair in permutations(product_ids, 2):
+                    pair_counts[pair] += 1
+                    pairs += 1
+
+                if orders % chunk_size == 0:
+                    recommender.add_pair_counts(pair_counts, generation)
+                    pair_counts.clear()
+                    self.stdout.write(f"  {orders} orders processed...")
+
+            if pair_counts:
+                recommender.add_pair_counts(pair_counts, generation)
+
+            if generation is not None:
+                previous = recommender.finish_rebuild(generation)
+                self.stdout.write(
+                    f"Switched to generation {generation}; "
+                    f"generation {previous} will be purged in the background."
+                )
+        except BaseException as exc:
+            if generation is not None:
+                try:
+                    recommender.abort_rebuild(generation)
+                except RedisError:
+                    pass
+            if isinstance(exc, RedisError):
+                raise CommandError(f"Redis unavailable: {exc}") from exc
+            raise
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt recommendations from {orders} orders "
+                f"({pairs} pair updates) in {elapsed:.1f}s."
+            )
+        )
@@ -1,14 +1,66 @@
 from django.db import models
+from django.db.models import Prefetch
 from django.urls import reverse
+from django.utils.translation import get_language
+from parler import appsettings
+from parler.managers import TranslatableManager, TranslatableQuerySet
 from parler.models import TranslatableModel, TranslatedFields
 
 
+def translations_prefetch(model, lookup="translations", language_code=None):
+    """
+    Prefetch only the translations parler can read for ``language_code``
+    (the active language by default) and its fallbacks.
+    """
+    languages = appsettings.PARLER_LANGUAGES.get_active_choices(
+        language_code or get_language()
+    )
+    translation_model = model._parler_meta.root_model
+    return Prefetch(
+        lookup,
+        queryset=translation_model.objects.filter(language_code__in=languages),
+    )
+
+
+class CategoryQuerySet(TranslatableQuerySet):
+    def with_translations(self, language_code=None):
+        """
+        Load the translations needed to render each category in one
+        extra query, however many categories are returned.
+        """
+        return self.prefetch_related(
+            translations_prefetch(self.model, language_code=language_code)
+        )
+
+
+class ProductQuerySet(TranslatableQuerySet):
+    def with_translations(self, language_code=None):
+        """
+        Join the category and load product and category translations
+        up front so rendering names, slugs and URLs runs no queries.
+        """
+        return self.select_related("category").prefetch_related(
+            translations_prefetch(self.model, language_code=language_code),
+            translations_prefetch(
+                Category, "category__translations", language_code=language_code
+            ),
+        )
+
+    def catalog(self, language_code=None):
+        """
+        Available products, ready to render in the given language.
+        """
+        return self.filter(available=True).with_translations(language_code)
+
+
 class Category(TranslatableModel):
     translations = TranslatedFields(
         name=models.CharField(max_length=200),
         slug=models.SlugField(max_length=200, unique=True),
     )
 
+    objects = TranslatableManager.from_queryset(CategoryQuerySet)()
+
     class Meta:
         # ordering = ['name']
         # indexes = [
@@ -39,6 +91,8 @@ class Product(TranslatableModel):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = TranslatableManager.from_queryset(ProductQuerySet)()
+
     class Meta:
         # ordering = ['name']
         indexes = [
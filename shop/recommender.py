@@ -1,76 +1,498 @@
+import asyncio
+import heapq
+import logging
+import threading
+import time
+import weakref
+from collections import defaultdict
+
 import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
 from redis.exceptions import RedisError
 from django.conf import settings
+from prometheus_client import Counter
+from .copurchase import get_index
 from .models import Product
 
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
 
 def get_redis():
     """
-    Create a Redis client on-demand so the app can recover
-    if Redis restarts or is temporarily unavailable.
+    Return the process-wide Redis client. Connections come from a shared
+    pool with bounded connect/read timeouts, and idle connections are
+    health-checked before reuse so the app recovers after a Redis restart.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                pool = redis.BlockingConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    decode_responses=True,
+                    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_SOCKET_TIMEOUT,
+                )
+                _client = redis.Redis(connection_pool=pool)
+    return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """
+    Return the asyncio Redis client of the running event loop. Connections
+    belong to the loop that opened them, so each loop gets its own pool,
+    configured like the one of :func:`get_redis`. Only use it from the
+    long-lived loop of an ASGI server; short-lived loops would each leave
+    a pool behind.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool = redis.asyncio.BlockingConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        client = _async_clients[loop] = redis.asyncio.Redis(connection_pool=pool)
+    return client
+
+
+BREAKER_EVENTS = Counter(
+    "recommender_breaker_events",
+    "Redis circuit breaker events: failed calls, trips and short-circuited calls.",
+    ["event"],
+)
+for event in ("failures", "trips", "short_circuits"):
+    BREAKER_EVENTS.labels(event)
+
+
+class CircuitBreaker:
+    """
+    Stop calling Redis for ``cooldown`` seconds after ``threshold``
+    consecutive failures. Once the cooldown expires a single trial call is
+    let through; its outcome closes the breaker or opens it again.
     """
-    return redis.Redis(
-        host=settings.REDIS_HOST,
-        port=settings.REDIS_PORT,
-        db=settings.REDIS_DB,
-        decode_responses=True,
-    )
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.cooldown:
+                # Let one trial call through and hold the others back
+                self.opened_at = now
+                return True
+            BREAKER_EVENTS.labels("short_circuits").inc()
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            BREAKER_EVENTS.labels("failures").inc()
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                BREAKER_EVENTS.labels("trips").inc()
+                logger.warning(
+                    "Redis circuit breaker opened for %ss (consecutive failures=%s)",
+                    self.cooldown,
+                    self.failures,
+                )
+
+
+breaker = CircuitBreaker(
+    threshold=settings.RECOMMENDER_BREAKER_THRESHOLD,
+    cooldown=settings.RECOMMENDER_BREAKER_COOLDOWN,
+)
+
+
+GENERATION_KEY = "recommender:generation"
+GENERATION_COUNTER_KEY = "recommender:generation_counter"
+BUILDING_KEY = "recommender:building"
+
+# Readers cache the live generation for a few seconds; purges of a retired
+# generation are delayed well past this so in-flight reads still find keys
+GENERATION_CACHE_SECONDS = 5
+PURGE_DELAY_SECONDS = 60
+
+_generation_cache = (None, 0.0)
+
+# Records one purchase in the live generation and, while a rebuild runs, in
+# the one being built, resolving both in the same round trip. Key names are
+# filled in from the templates in ARGV[1] and ARGV[2]; ARGV[3] is top_k and
+# the rest are the product ids.
+RECORD_PURCHASE_SCRIPT = """
+local live = tonumber(redis.call("GET", KEYS[1]) or 0)
+local generations = {live}
+local building = redis.call("GET", KEYS[2])
+if building and tonumber(building) ~= live then
+    table.insert(generations, tonumber(building))
+end
+local top_k = tonumber(ARGV[3])
+for _, generation in ipairs(generations) do
+    generation = tostring(generation)
+    for i = 4, #ARGV do
+        local key = ARGV[1]:gsub("{generation}", generation):gsub("{id}", ARGV[i])
+        for j = 4, #ARGV do
+            if i ~= j then
+                redis.call("ZINCRBY", key, 1, ARGV[j])
+            end
+        end
+        local suggestions_key = ARGV[2]:gsub("{generation}", generation):gsub(
+            "{id}", ARGV[i]
+        )
+        redis.call("ZRANGESTORE", suggestions_key, key, 0, top_k - 1, "REV")
+    end
+end
+"""
 
 
 class Recommender:
-    def get_product_key(self, id):
-        return f"product:{id}:purchased_with"
+    # Number of precomputed suggestions kept per product
+    top_k = 20
+
+    def get_product_key(self, id, generation):
+        return f"rec:{generation}:product:{id}:purchased_with"
+
+    def get_suggestions_key(self, id, generation):
+        return f"rec:{generation}:product:{id}:suggestions"
+
+    def get_generation(self, r):
+        """
+        Return the live generation, cached briefly per process so that
+        lookups don't pay an extra round trip.
+        """
+        global _generation_cache
+        generation, expires = _generation_cache
+        now = time.monotonic()
+        if generation is None or now >= expires:
+            generation = int(r.get(GENERATION_KEY) or 0)
+            _generation_cache = (generation, now + GENERATION_CACHE_SECONDS)
+        return generation
+
+    async def aget_generation(self, r):
+        """
+        Async counterpart of :meth:`get_generation`, sharing its cache.
+        """
+        global _generation_cache
+        generation, expires = _generation_cache
+        now = time.monotonic()
+        if generation is None or now >= expires:
+            generation = int(await r.get(GENERATION_KEY) or 0)
+            _generation_cache = (generation, now + GENERATION_CACHE_SECONDS)
+        return generation
+
+    def _queue_refresh(self, pipe, product_id, generation):
+        # Copy the K highest scored co-purchases into the per-product top list
+        pipe.zrangestore(
+            self.get_suggestions_key(product_id, generation),
+            self.get_product_key(product_id, generation),
+            0,
+            self.top_k - 1,
+            desc=True,
+        )
 
     def products_bought(self, products):
         product_ids = [p.id for p in products]
         if len(product_ids) < 2:
             return
 
+        if not breaker.allow():
+            return
+
         r = get_redis()
         try:
-            for product_id in product_ids:
-                for with_id in product_ids:
-                    if product_id != with_id:
-                        r.zincrby(self.get_product_key(product_id), 1, with_id)
+            # Keys are built server-side, so this assumes a single Redis
+            # instance rather than a cluster
+            r.register_script(RECORD_PURCHASE_SCRIPT)(
+                keys=[GENERATION_KEY, BUILDING_KEY],
+                args=[
+                    self.get_product_key("{id}", "{generation}"),
+                    self.get_suggestions_key("{id}", "{generation}"),
+                    self.top_k,
+                    *product_ids,
+                ],
+            )
         except RedisError:
             # Redis down -> skip recording rather than crashing checkout/webhooks
+            breaker.record_failure()
             return
+        breaker.record_success()
+
+    def add_pair_counts(self, pair_counts, generation=None, batch_size=5000):
+        """
+        Apply pre-aggregated co-purchase counts, given as a mapping of
+        ``(product_id, with_id) -> count``, in pipelined batches. Counts go
+        to the live generation unless another one is given.
+        """
+        r = get_redis()
+        if generation is None:
+            generation = int(r.get(GENERATION_KEY) or 0)
+        pipe = r.pipeline(transaction=False)
+        queued = 0
+        touched = set()
+        for (product_id, with_id), count in pair_counts.items():
+            pipe.zincrby(self.get_product_key(product_id, generation), count, with_id)
+            touched.add(product_id)
+            queued += 1
+            if queued >= batch_size:
+                pipe.execute()
+                queued = 0
+        for product_id in touched:
+            self._queue_refresh(pipe, product_id, generation)
+            queued += 1
+            if queued >= batch_size:
+                pipe.execute()
+                queued = 0
+        if queued:
+            pipe.execute()
 
     def suggest_products_for(self, products, max_results=6):
         product_ids = [p.id for p in products]
+        return self.get_suggested_products(
+            product_ids, self.suggest_ids_for(product_ids, max_results), max_results
+        )
+
+    def suggest_ids_for(self, product_ids, max_results=6):
+        """
+        Return the ids of the products most often bought with
+        ``product_ids``, or ``None`` if Redis is unavailable; see
+        :meth:`get_suggested_products`.
+        """
         if not product_ids:
             return []
 
+        if not breaker.allow():
+            return None
+
         r = get_redis()
         try:
+            generation = self.get_generation(r)
             if len(product_ids) == 1:
                 suggestions = r.zrange(
-                    self.get_product_key(product_ids[0]), 0, -1, desc=True
-                )[:max_results]
+                    self.get_suggestions_key(product_ids[0], generation),
+                    0,
+                    max_results - 1,
+                    desc=True,
+                )
+                suggested_products_ids = [int(x) for x in suggestions]
             else:
-                flat_ids = "_".join(map(str, product_ids))
-                tmp_key = f"tmp_{flat_ids}"
+                # Merge the bounded top lists client-side; no temporary keys
+                pipe = r.pipeline(transaction=False)
+                for product_id in product_ids:
+                    pipe.zrange(
+                        self.get_suggestions_key(product_id, generation),
+                        0,
+                        -1,
+                        desc=True,
+                        withscores=True,
+                    )
+                suggested_products_ids = self.merge_suggestions(
+                    pipe.execute(), product_ids, max_results
+                )
+        except RedisError:
+            breaker.record_failure()
+            return None
+        breaker.record_success()
+        return suggested_products_ids
 
-                keys = [self.get_product_key(pid) for pid in product_ids]
-                r.zunionstore(tmp_key, keys)
-                r.zrem(tmp_key, *product_ids)
+    def lookup_ids_for(self, product_ids, max_results=6, use_asyncio=False):
+        """
+        Return an awaitable of :meth:`suggest_ids_for`, for async views to
+        run alongside their database queries.
 
-                suggestions = r.zrange(tmp_key, 0, -1, desc=True)[:max_results]
-                r.delete(tmp_key)
+        ``use_asyncio`` selects the asyncio client, which only pays off
+        under an ASGI server where every request shares one long-lived
+        event loop. Under WSGI, Django runs each async view in a new loop,
+        which would open a new pool per request, so the lookup runs on
+        the shared pooled client in a worker thread instead.
+        """
+        if use_asyncio:
+            return self.asuggest_ids_for(product_ids, max_results)
+        return sync_to_async(self.suggest_ids_for, thread_sensitive=False)(
+            product_ids, max_results
+        )
 
-            suggested_products_ids = [int(x) for x in suggestions]
+    async def asuggest_ids_for(self, product_ids, max_results=6):
+        """
+        Async counterpart of :meth:`suggest_ids_for` using the asyncio
+        client of the running loop; see :meth:`lookup_ids_for`.
+        """
+        if not product_ids:
+            return []
 
+        if not breaker.allow():
+            return None
+
+        r = get_async_redis()
+        try:
+            generation = await self.aget_generation(r)
+            if len(product_ids) == 1:
+                suggestions = await r.zrange(
+                    self.get_suggestions_key(product_ids[0], generation),
+                    0,
+                    max_results - 1,
+                    desc=True,
+                )
+                suggested_products_ids = [int(x) for x in suggestions]
+            else:
+                pipe = r.pipeline(transaction=False)
+                for product_id in product_ids:
+                    pipe.zrange(
+                        self.get_suggestions_key(product_id, generation),
+                        0,
+                        -1,
+                        desc=True,
+                        withscores=True,
+                    )
+                suggested_products_ids = self.merge_suggestions(
+                    await pipe.execute(), product_ids, max_results
+                )
         except RedisError:
+            breaker.record_failure()
+            return None
+        breaker.record_success()
+        return suggested_products_ids
+
+    def get_suggested_products(self, product_ids, suggested_ids, max_results=6):
+        """
+        Return the products for ids from :meth:`suggest_ids_for`, falling
+        back to the offline index when the lookup returned ``None``.
+        """
+        if suggested_ids is None:
+            return self.offline_suggestions(product_ids, max_results)
+        return self.get_products(suggested_ids)
+
+    def merge_suggestions(self, top_lists, product_ids, max_results):
+        # Merge the bounded top lists client-side; no temporary keys
+        scores = defaultdict(float)
+        for suggestions in top_lists:
+            for with_id, score in suggestions:
+                scores[int(with_id)] += score
+        for product_id in product_ids:
+            scores.pop(product_id, None)
+        return heapq.nlargest(max_results, scores, key=lambda pid: (scores[pid], pid))
+
+    def offline_suggestions(self, product_ids, max_results=6):
+        """
+        Serve suggestions from the offline co-purchase index, if one has
+        been built, while Redis is unavailable.
+        """
+        index = get_index()
+        if index is None:
             return []
+        return self.get_products(index.suggest(product_ids, max_results))
 
-        suggested_products = list(Product.objects.filter(id__in=suggested_products_ids))
-        suggested_products.sort(key=lambda x: suggested_products_ids.index(x.id))
-        return suggested_products
+    def get_products(self, product_ids):
+        # One query, then restore the ranking from the id -> product map
+        products_by_id = Product.objects.with_translations().in_bulk(product_ids)
+        return [products_by_id[pid] for pid in product_ids if pid in products_by_id]
 
-    def clear_purchases(self):
+    def start_rebuild(self):
+        """
+        Allocate a fresh, empty generation and register it as being built
+        so live purchases are recorded in it too. Returns the generation.
+        """
+        r = get_redis()
+        # Make sure the counter never hands out the live generation again
+        r.setnx(GENERATION_COUNTER_KEY, r.get(GENERATION_KEY) or 0)
+        generation = r.incr(GENERATION_COUNTER_KEY)
+        r.set(BUILDING_KEY, generation)
+        return generation
+
+    def finish_rebuild(self, generation):
+        """
+        Atomically make ``generation`` the live one and schedule the
+        retired generation for a background purge. Returns the retired
+        generation.
+        """
+        r = get_redis()
+        pipe = r.pipeline(transaction=True)
+        pipe.set(GENERATION_KEY, generation, get=True)
+        pipe.delete(BUILDING_KEY)
+        previous, _ = pipe.execute()
+        previous = int(previous or 0)
+        self.schedule_purge(previous)
+        return previous
+
+    def abort_rebuild(self, generation):
+        """
+        Drop a partially built generation without ever making it live.
+        """
         r = get_redis()
+        if int(r.get(BUILDING_KEY) or -1) == generation:
+            r.delete(BUILDING_KEY)
+        self.schedule_purge(generation)
+
+    def schedule_purge(self, generation):
+        from .tasks import purge_recommender_generation
+
+        try:
+            purge_recommender_generation.apply_async(
+                (generation,), countdown=PURGE_DELAY_SECONDS
+            )
+        except Exception:
+            logger.exception(
+                "Could not schedule purge of recommender generation %s", generation
+            )
+
+    def purge_generation(self, generation, batch_size=500):
+        """
+        Remove every key of a retired generation with incremental SCAN and
+        non-blocking UNLINK batches. Returns the number of keys removed.
+        """
+        r = get_redis()
+        live, building = r.mget(GENERATION_KEY, BUILDING_KEY)
+        if generation in (int(live or 0), int(building or -1)):
+            logger.warning("Refusing to purge active generation %s", generation)
+            return 0
+
+        removed = 0
+        batch = []
+        for key in r.scan_iter(match=f"rec:{generation}:*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                removed += r.unlink(*batch)
+                batch = []
+        if batch:
+            removed += r.unlink(*batch)
+        return removed
+
+    def clear_purchases(self):
+        """
+        Switch to an empty generation; the old keys, including those of
+        products that no longer exist, are purged in the background.
+        """
         try:
-            for id in Product.objects.values_list("id", flat=True):
-                r.delete(self.get_product_key(id))
+            self.finish_rebuild(self.start_rebuild())
         except RedisError:
             return
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import listing
+from .models import Category, Product
+
+ProductTranslation = Product._parler_meta.root_model
+CategoryTranslation = Category._parler_meta.root_model
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_category(sender, instance, **kwargs):
+    # A product moved to another category must leave the old listing too
+    instance._previous_category_id = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list("category_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_listings(sender, instance, **kwargs):
+    category_ids = {instance.category_id}
+    previous_id = getattr(instance, "_previous_category_id", None)
+    if previous_id:
+        category_ids.add(previous_id)
+    listing.invalidate_categories(category_ids)
+
+
+@receiver(post_save, sender=ProductTranslation)
+@receiver(post_delete, sender=ProductTranslation)
+def invalidate_product_translation_listings(sender, instance, **kwargs):
+    category_id = (
+        Product.objects.filter(pk=instance.master_id)
+        .values_list("category_id", flat=True)
+        .first()
+    )
+    listing.invalidate_categories([category_id] if category_id else [])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryTranslation)
+@receiver(post_delete, sender=CategoryTranslation)
+def invalidate_category_listings(sender, instance, **kwargs):
+    listing.invalidate_catalog()
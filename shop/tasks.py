@@ -0,0 +1,44 @@
+import logging
+
+from celery import shared_task
+
+from .models import Product
+from .recommender import Recommender
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={"max_retries": 5, "countdown": 60},
+)
+def purge_recommender_generation(self, generation: int) -> int:
+    """
+    Reclaim the Redis keys of a retired recommender generation.
+    Returns the number of keys removed.
+    """
+    removed = Recommender().purge_generation(generation)
+    logger.info(
+        "purge_recommender_generation: generation=%s removed=%s",
+        generation,
+        removed,
+    )
+    return removed
+
+
+@shared_task
+def record_order_purchase(order_id: int) -> int:
+    """
+    Record the products of a paid order as bought together.
+    Returns the number of products recorded.
+    """
+    products = list(
+        Product.objects.filter(order_items__order_id=order_id).distinct().only("id")
+    )
+    # Skips silently (and cheaply, once the breaker opens) if Redis is down
+    Recommender().products_bought(products)
+    logger.info(
+        "record_order_purchase: order_id=%s products=%s", order_id, len(products)
+    )
+    return len(products)
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from .listing import decode_cursor, encode_cursor
+from .management.commands.bench_views import Command as BenchViewsCommand
+from .recommender import CircuitBreaker
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    PRODUCT_LIST_PAGE_SIZE=2,
+)
+class ProductListCursorTests(TestCase):
+    def setUp(self):
+        _, self.products = BenchViewsCommand().create_products(3)
+        with translation.override("en"):
+            self.url = reverse("shop:product_list")
+
+    def test_cursor_round_trip(self):
+        product = self.products[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(product)), (product.created, product.pk)
+        )
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ["", "!!!", "bm90LWEtY3Vyc29y", "MjAyNnx4"]:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+
+    def test_malformed_cursor_shows_first_page(self):
+        first_page = self.client.get(self.url)
+        response = self.client.get(self.url, {"after": "!!!"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["listing"], first_page.context["listing"])
+        # Newest first, so the last product created opens the first page
+        self.assertContains(response, self.products[-1].name)
+        self.assertNotContains(response, self.products[0].name)
+
+
+class CircuitBreakerTests(TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, cooldown=30)
+        patcher = mock.patch("shop.recommender.time.monotonic", return_value=100.0)
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def trip(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_opens_after_threshold_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_single_trial_call_after_cooldown(self):
+        self.trip()
+        self.monotonic.return_value = 130.0
+
+        self.assertTrue(self.breaker.allow())
+        # Other calls wait for the trial's outcome
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_trial_closes(self):
+        self.trip()
+        self.monotonic.return_value = 130.0
+        self.breaker.allow()
+
+        self.breaker.record_success()
+
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_opens_again(self):
+        self.trip()
+        self.monotonic.return_value = 130.0
+        self.breaker.allow()
+
+        self.breaker.record_failure()
+
+        self.monotonic.return_value = 159.0
+        self.assertFalse(self.breaker.allow())
+        self.monotonic.return_value = 160.0
+        self.assertTrue(self.breaker.allow())
@@ -1,46 +1,80 @@
-from django.shortcuts import get_object_or_404, render
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
+from django.template.loader import render_to_string
 
 from cart.forms import CartAddProductForm
+from .listing import (
+    decode_cursor,
+    encode_position,
+    get_listing,
+    is_product_position,
+    paginate,
+    set_listing,
+)
 from .models import Category, Product
 from .recommender import Recommender
 
 
 def product_list(request, category_slug=None):
-    category = None
-    categories = Category.objects.all()
-    products = Product.objects.filter(available=True)
-    if category_slug:
-        language = request.LANGUAGE_CODE
-        category = get_object_or_404(
-            Category,
-            translations__language_code=language,
-            translations__slug=category_slug,
-        )
-        products = products.filter(category=category)
-    return render(
-        request,
-        "shop/product/list.html",
-        {
-            "category": category,
-            "categories": categories,
-            "products": products,
-        },
-    )
+    language = request.LANGUAGE_CODE
+    position = decode_cursor(request.GET.get("after"))
+    # Equivalent spellings of a position share one cache entry
+    cursor = encode_position(position) if position else None
+    listing = get_listing(language, category_slug, cursor)
+    if listing is None:
+        category = None
+        categories = Category.objects.with_translations(language)
+        products = Product.objects.catalog(language)
+        if category_slug:
+            category = get_object_or_404(
+                Category.objects.with_translations(language),
+                translations__language_code=language,
+                translations__slug=category_slug,
+            )
+            products = products.filter(category=category)
+        products, next_cursor = paginate(products, position)
+        listing = {
+            "title": category.name if category else "",
+            "content": render_to_string(
+                "shop/product/list_content.html",
+                {
+                    "category": category,
+                    "categories": categories,
+                    "products": products,
+                    "is_first_page": position is None,
+                    "next_cursor": next_cursor,
+                },
+            ),
+        }
+        # Only pages reached through cursors paginate() hands out are cached;
+        # arbitrary positions would each add an entry
+        if position is None or is_product_position(position):
+            set_listing(language, category_slug, cursor, listing)
+    return render(request, "shop/product/list.html", {"listing": listing})
 
 
-def product_detail(request, id, slug):
+async def product_detail(request, id, slug):
     language = request.LANGUAGE_CODE
-    product = get_object_or_404(
-        Product,
-        id=id,
-        translations__language_code=language,
-        translations__slug=slug,
-        available=True,
+    r = Recommender()
+    # The suggestions only need the id, so look them up alongside the product
+    product, suggested_ids = await asyncio.gather(
+        aget_object_or_404(
+            Product.objects.with_translations(language),
+            id=id,
+            translations__language_code=language,
+            translations__slug=slug,
+            available=True,
+        ),
+        r.lookup_ids_for([id], 4, use_asyncio=isinstance(request, ASGIRequest)),
+    )
+    recommended_products = await sync_to_async(r.get_suggested_products)(
+        [id], suggested_ids, 4
     )
     cart_product_form = CartAddProductForm()
-    r = Recommender()
-    recommended_products = r.suggest_products_for([product], 4)
-    return render(
+    return await sync_to_async(render)(
         request,
         "shop/product/detail.html",
         {